@@ -0,0 +1,547 @@
+# -*- coding: utf-8 -*-
+"""An FTP client using asyncio streams, for CPython and MicroPython.
+
+The ``AsyncFTP`` class mirrors the API of ``ftplib.FTP``, but all methods,
+which communicate with the server, are coroutines. This allows a single event
+loop to drive many transfers concurrently with other tasks.
+
+Example::
+
+    >>> import asyncio
+    >>> from ftpasync import AsyncFTP
+    >>> async def main():
+    ...     async with AsyncFTP() as ftp:
+    ...         await ftp.connect('example.com')
+    ...         await ftp.login('username', 'password')
+    ...         with open('data.bin', 'wb') as fp:
+    ...             await ftp.retrbinary('RETR data.bin', fp.write)
+    ...         print(await ftp.nlst())
+    ...
+    >>> asyncio.run(main())
+
+Only passive mode transfers are supported.
+
+"""
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+import sys
+
+import ftplib
+from ftplib import (CRLF, FTP_PORT, MAXLINE, Error, error_perm, error_proto, error_reply,
+                    error_temp, parse150, parse227, parse229, parse257, parse_mlst,
+                    parse_mlsx)
+
+
+class AsyncFTP:
+    """An FTP client class using asyncio streams.
+
+    Create an instance and then call the ``connect()`` and ``login()``
+    coroutines. Apart from that, the API is the same as the one of
+    ``ftplib.FTP``, with the following differences:
+
+    - All methods, which communicate with the server, are coroutines.
+    - Only passive mode is supported.
+    - ``mlsd()`` returns a list instead of a generator.
+
+    Callbacks passed to the transfer methods are normal functions.
+    """
+
+    debugging = 0
+    host = None
+    port = FTP_PORT
+    maxline = MAXLINE
+    welcome = None
+    encoding = "latin-1"
+
+    def __init__(self):
+        self._reader = None
+        self._writer = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        if self._writer is not None:
+            try:
+                await self.quit()
+            except (OSError, EOFError):
+                pass
+            finally:
+                if self._writer is not None:
+                    await self.close()
+
+    async def connect(self, host=None, port=None):
+        """Connect to host and return the welcome message."""
+        if host:
+            self.host = host
+        if port:
+            self.port = port
+
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self.welcome = await self.getresp()
+        return self.welcome
+
+    def getwelcome(self):
+        """Get the welcome message from the server."""
+        return self.welcome
+
+    def set_debuglevel(self, level):
+        """Set the debugging level (see ``ftplib.FTP.set_debuglevel``)."""
+        self.debugging = level
+
+    debug = set_debuglevel
+
+    # Internal: "sanitize" a string for printing
+    sanitize = ftplib.FTP.sanitize
+
+    # Internal: send one command to the server, appending CRLF
+    async def putcmd(self, line):
+        if self.debugging:
+            print('*cmd*', self.sanitize(line))
+
+        self._writer.write((line + CRLF).encode(self.encoding))
+        await self._writer.drain()
+
+    # Internal: return one line from the server, stripping CRLF.
+    # Raise EOFError if the connection is closed
+    async def getline(self):
+        line = await self._reader.readline()
+        if len(line) > self.maxline:
+            raise Error("got more than %d bytes" % self.maxline)
+        if self.debugging > 1:
+            print('*get*', self.sanitize(line))
+        if not line:
+            raise EOFError
+        return line.decode(self.encoding).rstrip(CRLF)
+
+    # Internal: get a response from the server, which may possibly
+    # consist of multiple lines.
+    async def getmultiline(self):
+        line = await self.getline()
+        if line[3:4] == '-':
+            code = line[:3]
+            lines = [line]
+            while 1:
+                nextline = await self.getline()
+                lines.append(nextline)
+                if nextline[:3] == code and nextline[3:4] != '-':
+                    break
+            line = '\n'.join(lines)
+        return line
+
+    # Internal: get a response from the server.
+    # Raise various errors if the response indicates an error
+    async def getresp(self):
+        resp = await self.getmultiline()
+        if self.debugging:
+            print('*resp*', self.sanitize(resp))
+
+        self.lastresp = resp[:3]
+        c = resp[:1]
+
+        if c in {'1', '2', '3'}:
+            return resp
+        if c == '4':
+            raise error_temp(resp)
+        if c == '5':
+            raise error_perm(resp)
+        raise error_proto(resp)
+
+    async def voidresp(self):
+        """Expect a response beginning with '2'."""
+        resp = await self.getresp()
+        if not resp.startswith('2'):
+            raise error_reply(resp)
+        return resp
+
+    async def sendcmd(self, cmd):
+        """Send a command and return the response."""
+        await self.putcmd(cmd)
+        return await self.getresp()
+
+    async def voidcmd(self, cmd):
+        """Send a command and expect a response beginning with '2'."""
+        await self.putcmd(cmd)
+        return await self.voidresp()
+
+    async def makepasv(self):
+        try:
+            host, port = parse227(await self.sendcmd('PASV'))
+        except error_perm:
+            # Server may only support the extended command (e.g. with IPv6)
+            port = parse229(await self.sendcmd('EPSV'))
+            host = self.host
+
+        return host, port
+
+    async def ntransfercmd(self, cmd, rest=None):
+        """Initiate a transfer over the data connection.
+
+        Send a PASV command, connect to the data port and send the transfer
+        command. Return a (reader, writer) tuple of streams for the data
+        connection and the expected size of the transfer, which may be None
+        if it could not be determined.
+        """
+        size = None
+        host, port = await self.makepasv()
+        reader, writer = await asyncio.open_connection(host, port)
+
+        try:
+            if rest is not None:
+                await self.sendcmd("REST %s" % rest)
+
+            resp = await self.sendcmd(cmd)
+            # Some servers send a 200 reply before the 150 reply. See
+            # ftplib.FTP.ntransfercmd().
+            if resp[0] == '2':
+                resp = await self.getresp()
+
+            if resp[0] != '1':
+                raise error_reply(resp)
+
+            await self._secure_data(reader, writer)
+        except:
+            await _close_stream(writer)
+            raise
+
+        if resp.startswith('150'):
+            size = parse150(resp)
+
+        return (reader, writer), size
+
+    async def transfercmd(self, cmd, rest=None):
+        """Like ntransfercmd() but returns only the data streams."""
+        return (await self.ntransfercmd(cmd, rest))[0]
+
+    async def login(self, user='', passwd='', acct=''):
+        """Login, default anonymous."""
+        if not user:
+            user = 'anonymous'
+        if not passwd:
+            passwd = ''
+        if not acct:
+            acct = ''
+
+        if user == 'anonymous' and passwd in ('', '-'):
+            passwd = 'anonymous@'
+
+        resp = await self.sendcmd('USER ' + user)
+
+        if resp[0] == '3':
+            resp = await self.sendcmd('PASS ' + passwd)
+
+        if resp[0] == '3':
+            resp = await self.sendcmd('ACCT ' + acct)
+
+        if resp[0] != '2':
+            raise error_reply(resp)
+
+        return resp
+
+    async def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
+        """Retrieve data in binary mode.
+
+        See ``ftplib.FTP.retrbinary()`` for a description of the arguments.
+        """
+        await self.voidcmd('TYPE I')
+        reader, writer = await self.transfercmd(cmd, rest)
+
+        try:
+            while 1:
+                data = await reader.read(blocksize)
+                if not data:
+                    break
+                callback(data)
+        finally:
+            await _close_stream(writer)
+
+        return await self.voidresp()
+
+    async def retrlines(self, cmd, callback=None):
+        """Retrieve data in line mode.
+
+        See ``ftplib.FTP.retrlines()`` for a description of the arguments.
+        """
+        if callback is None:
+            callback = print
+
+        await self.voidcmd('TYPE A')
+        reader, writer = await self.transfercmd(cmd)
+
+        try:
+            while 1:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                if len(line) > self.maxline:
+                    raise Error("got more than %d bytes" % self.maxline)
+
+                if self.debugging > 2:
+                    print('*retr*', repr(line))
+
+                callback(line.decode(self.encoding).rstrip(CRLF))
+        finally:
+            await _close_stream(writer)
+
+        return await self.voidresp()
+
+    async def storbinary(self, cmd, fp, blocksize=8192, callback=None, rest=None):
+        """Store a file in binary mode.
+
+        See ``ftplib.FTP.storbinary()`` for a description of the arguments.
+        """
+        await self.voidcmd('TYPE I')
+        reader, writer = await self.transfercmd(cmd, rest)
+
+        try:
+            while 1:
+                buf = fp.read(blocksize)
+                if not buf:
+                    break
+
+                writer.write(buf)
+                await writer.drain()
+                if callback:
+                    callback(buf)
+        finally:
+            await _close_stream(writer)
+
+        return await self.voidresp()
+
+    async def storlines(self, cmd, fp, callback=None):
+        """Store a file in line mode.
+
+        See ``ftplib.FTP.storlines()`` for a description of the arguments.
+        """
+        await self.voidcmd('TYPE A')
+        reader, writer = await self.transfercmd(cmd)
+
+        try:
+            while 1:
+                buf = fp.readline(self.maxline + 1)
+                if len(buf) > self.maxline:
+                    raise Error("got more than %d bytes" % self.maxline)
+                if not buf:
+                    break
+                if buf[-2:] != ftplib.B_CRLF:
+                    if buf[-1] in ftplib.B_CRLF:
+                        buf = buf[:-1]
+                    buf = buf + ftplib.B_CRLF
+                writer.write(buf)
+                await writer.drain()
+                if callback:
+                    callback(buf)
+        finally:
+            await _close_stream(writer)
+
+        return await self.voidresp()
+
+    async def nlst(self, *args):
+        """Return a list of files in a given directory.
+
+        Defaults to the current directory.
+        """
+        cmd = 'NLST'
+        for arg in args:
+            cmd = cmd + (' ' + arg)
+        files = []
+        await self.retrlines(cmd, files.append)
+        return files
+
+    async def dir(self, *args, **kw):
+        """List a directory in long form.
+
+        See ``ftplib.FTP.dir()`` for a description of the arguments.
+        """
+        await self.retrlines(" ".join(['LIST'] + list(args)), kw.get('callback'))
+
+    async def mlsd(self, path="", facts=[]):
+        """List a directory in a standardized format by using MLSD command
+        (RFC-3659).
+
+        Returns a list of (name, facts) tuples. See ``ftplib.FTP.mlsd()``
+        for details.
+        """
+        if facts:
+            await self.sendcmd("OPTS MLST " + ";".join(facts) + ";")
+
+        entries = []
+        await self.retrlines("MLSD %s" % path if path else "MLSD",
+                             lambda line: entries.append(parse_mlsx(line)))
+        return entries
+
+    async def mlst(self, path="", facts=[]):
+        """Return the facts of a single file or directory by using the MLST
+        command (RFC-3659).
+
+        See ``ftplib.FTP.mlst()`` for details.
+        """
+        if facts:
+            await self.sendcmd("OPTS MLST " + ";".join(facts) + ";")
+
+        return parse_mlst(await self.voidcmd("MLST %s" % path if path else "MLST"))
+
+    async def rename(self, fromname, toname):
+        """Rename a file."""
+        resp = await self.sendcmd('RNFR ' + fromname)
+        if resp[0] != '3':
+            raise error_reply(resp)
+        return await self.voidcmd('RNTO ' + toname)
+
+    async def delete(self, filename):
+        """Delete a file."""
+        resp = await self.sendcmd('DELE ' + filename)
+        if resp[:3] in {'250', '200'}:
+            return resp
+        else:
+            raise error_reply(resp)
+
+    async def cwd(self, dirname):
+        """Change to a directory."""
+        if dirname == '..':
+            try:
+                return await self.voidcmd('CDUP')
+            except error_perm as msg:
+                if msg.args[0][:3] != '500':
+                    raise
+        elif dirname == '':
+            dirname = '.'
+        return await self.voidcmd('CWD ' + dirname)
+
+    async def size(self, filename):
+        """Retrieve the size of a file."""
+        resp = await self.sendcmd('SIZE ' + filename)
+        if resp[:3] == '213':
+            return int(resp[3:].strip())
+
+    async def mkd(self, dirname):
+        """Make a directory, return its full pathname."""
+        resp = await self.voidcmd('MKD ' + dirname)
+        if not resp.startswith('257'):
+            return ''
+        return parse257(resp)
+
+    async def rmd(self, dirname):
+        """Remove a directory."""
+        return await self.voidcmd('RMD ' + dirname)
+
+    async def pwd(self):
+        """Return current working directory."""
+        resp = await self.voidcmd('PWD')
+        if not resp.startswith('257'):
+            return ''
+        return parse257(resp)
+
+    async def quit(self):
+        """Quit, and close the connection."""
+        resp = await self.voidcmd('QUIT')
+        await self.close()
+        return resp
+
+    async def close(self):
+        """Close the connection without assuming anything about it."""
+        writer = self._writer
+        self._reader = self._writer = None
+        if writer is not None:
+            await _close_stream(writer)
+
+    # Internal: hook for securing the data connection after the transfer
+    # command was accepted
+    async def _secure_data(self, reader, writer):
+        pass
+
+
+class AsyncFTP_TLS(AsyncFTP):
+    """An AsyncFTP subclass, which adds FTP-over-TLS support (RFC-4217).
+
+    Like ``ftplibtls.FTP_TLS``, ``login()`` secures the control connection
+    and securing the data connection requires calling ``prot_p()``.
+
+    Securing an already established connection requires ``start_tls()``
+    support of asyncio streams (CPython 3.11 or later). On MicroPython the
+    socket of the stream is wrapped directly.
+    """
+
+    def __init__(self, ssl_context=None, server_hostname=None):
+        # MicroPython's streams have no start_tls(), but their socket can be
+        # wrapped (see _start_tls())
+        if (not hasattr(asyncio.StreamWriter, 'start_tls') and
+                sys.implementation.name != 'micropython'):
+            raise Error("AsyncFTP_TLS requires asyncio streams with start_tls() "
+                        "(CPython 3.11 or later)")
+
+        super().__init__()
+        self.ssl_context = ssl_context
+        self.server_hostname = server_hostname
+        self._wrapped = False
+        self._prot_p = False
+
+    async def login(self, user='', passwd='', acct='', secure=True):
+        if secure and not self._wrapped:
+            await self.auth()
+        return await super().login(user, passwd, acct)
+
+    async def auth(self):
+        """Set up secure control connection by using TLS/SSL."""
+        if self._wrapped:
+            raise ValueError("Already using TLS")
+
+        resp = await self.voidcmd('AUTH TLS')
+        await self._start_tls(self._reader, self._writer)
+        self._wrapped = True
+        return resp
+
+    async def prot_p(self):
+        """Set up secure data connection."""
+        await self.voidcmd('PBSZ 0')
+        resp = await self.voidcmd('PROT P')
+        self._prot_p = True
+        return resp
+
+    async def prot_c(self):
+        """Set up clear text data connection."""
+        resp = await self.voidcmd('PROT C')
+        self._prot_p = False
+        return resp
+
+    async def _secure_data(self, reader, writer):
+        if self._prot_p:
+            await self._start_tls(reader, writer)
+
+    async def _start_tls(self, reader, writer):
+        from ftplibtls import ssl
+
+        if self.ssl_context is None:
+            if hasattr(ssl, 'create_default_context'):
+                self.ssl_context = ssl.create_default_context()
+            else:
+                self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+                self.ssl_context.verify_mode = ssl.CERT_OPTIONAL
+
+        hostname = self.server_hostname or self.host
+
+        if hasattr(writer, 'start_tls'):
+            await writer.start_tls(self.ssl_context, server_hostname=hostname)
+        elif hasattr(writer, 's'):
+            # MicroPython: reader and writer are the same Stream instance and
+            # the TLS handshake is done by the first non-blocking read or write.
+            sock = self.ssl_context.wrap_socket(writer.s, server_hostname=hostname,
+                                                do_handshake_on_connect=False)
+            sock.setblocking(False)
+            writer.s = sock
+        else:
+            raise Error("start_tls() not supported by asyncio streams")
+
+
+async def _close_stream(writer):
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
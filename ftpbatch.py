@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""Pipelined batches of commands on the control connection.
+
+Normally each command waits for the reply to the previous one, so a batch of
+n commands costs n round trips. ``pipeline()`` sends up to ``window``
+commands before reading their replies, which arrive in the same order, so
+the whole batch costs about n / window round trips.
+
+Example::
+
+    >>> from ftpbatch import delete_many, rename_many
+    >>> errors = delete_many(ftp, ['a.txt', 'b.txt', 'missing.txt'])
+    >>> errors
+    [('missing.txt', error_perm('550 No such file or directory.'))]
+    >>> rename_many(ftp, [('new.txt', 'done.txt')])
+    []
+
+Only commands which don't open a data connection can be pipelined. For
+batches of transfers, ``get_many()`` and ``put_many()`` cut the overhead per
+file instead::
+
+    >>> from ftpbatch import get_many, put_many
+    >>> get_many(ftp, ['logs/1.txt', 'logs/2.txt', ('logs/3.txt', '/tmp/3.txt')])
+    []
+
+"""
+
+try:
+    import errno
+except ImportError:
+    import uerrno as errno
+
+try:
+    import select
+except ImportError:
+    import uselect as select
+
+import ftplib
+from ftplib import error_perm, error_proto, error_temp
+from ftpupload import basename
+
+# Without poll(), data connections are opened in advance with a blocking
+# connect
+_poll = getattr(select, 'poll', None)
+# Errors of a non-blocking connect, which is still in progress
+_IN_PROGRESS = tuple(getattr(errno, name) for name in ('EINPROGRESS', 'EAGAIN', 'EWOULDBLOCK')
+                     if hasattr(errno, name)) + (10035,)  # WSAEWOULDBLOCK
+
+
+def pipeline(ftp, cmds, window=16):
+    """Send commands without waiting for the reply to each one.
+
+    Args:
+      ftp: An FTP instance.
+      cmds: An iterable of commands. An item may also be a tuple of commands,
+            which are sent one after the other and succeed or fail together,
+            e.g. ('RNFR old.txt', 'RNTO new.txt').
+      window: The maximum number of commands sent, whose replies were not
+              read yet.  [default: 16]
+
+    Returns:
+      A list with an item for each item of cmds: the reply (to the last
+      command of a tuple) or, for an error reply, the ``ftplib.error_temp``,
+      ``error_perm`` or ``error_proto`` exception (for the first command of a
+      tuple, which failed).
+    """
+    results = []
+    # (index of the result, command) for each command to send
+    queue = []
+
+    for item in cmds:
+        for cmd in ((item,) if isinstance(item, str) else item):
+            queue.append((len(results), cmd))
+
+        results.append(None)
+
+    sent = 0
+
+    for read, (i, _) in enumerate(queue):
+        while sent < len(queue) and sent - read < window:
+            ftp.putcmd(queue[sent][1])
+            sent += 1
+
+        try:
+            resp = ftp.getresp()
+        except (error_perm, error_proto, error_temp) as exc:
+            resp = exc
+
+        # The first error reply of a tuple of commands decides
+        if not isinstance(results[i], Exception):
+            results[i] = resp
+
+    return results
+
+
+# Internal: return a list of (item, exception) tuples for the error replies
+def _errors(items, results):
+    return [(item, exc) for item, exc in zip(items, results) if isinstance(exc, Exception)]
+
+
+def delete_many(ftp, filenames, window=16):
+    """Delete many files.
+
+    Returns a list of (filename, exception) tuples for the files, which could
+    not be deleted.
+    """
+    filenames = list(filenames)
+    return _errors(filenames, pipeline(ftp, ['DELE ' + name for name in filenames], window))
+
+
+def rename_many(ftp, names, window=16):
+    """Rename many files.
+
+    Names is an iterable of (fromname, toname) tuples. Returns a list of
+    ((fromname, toname), exception) tuples for the files, which could not be
+    renamed.
+    """
+    names = list(names)
+    cmds = [('RNFR ' + fromname, 'RNTO ' + toname) for fromname, toname in names]
+    return _errors(names, pipeline(ftp, cmds, window))
+
+
+def mkd_many(ftp, dirnames, window=16):
+    """Make many directories.
+
+    Returns a list of (dirname, exception) tuples for the directories, which
+    could not be created.
+    """
+    dirnames = list(dirnames)
+    return _errors(dirnames, pipeline(ftp, ['MKD ' + name for name in dirnames], window))
+
+
+def size_many(ftp, filenames, window=16):
+    """Retrieve the sizes of many files.
+
+    Returns a dictionary mapping each filename to its size, or to None if it
+    could not be retrieved.
+    """
+    filenames = list(filenames)
+    # SIZE is not allowed in ASCII mode by some servers
+    results = pipeline(ftp, ['TYPE I'] + ['SIZE ' + name for name in filenames], window)
+    sizes = {}
+
+    for name, resp in zip(filenames, results[1:]):
+        if isinstance(resp, Exception) or resp[:3] != '213':
+            sizes[name] = None
+        else:
+            sizes[name] = int(resp[3:].strip())
+
+    return sizes
+
+
+def mdtm_many(ftp, filenames, window=16):
+    """Retrieve the modification times of many files.
+
+    Returns a dictionary mapping each filename to its modification time as
+    returned by the server, i.e. a string of the form YYYYMMDDHHMMSS[.sss]
+    in UTC, or to None if it could not be retrieved.
+    """
+    filenames = list(filenames)
+    results = pipeline(ftp, ['MDTM ' + name for name in filenames], window)
+    times = {}
+
+    for name, resp in zip(filenames, results):
+        if isinstance(resp, Exception) or resp[:3] != '213':
+            times[name] = None
+        else:
+            times[name] = resp[4:].strip()
+
+    return times
+
+
+def get_many(ftp, files, blocksize=8192):
+    """Download many files, one after the other.
+
+    Unlike calling ``retrbinary()`` for each file, the transfer type is set
+    only once for all files. With passive mode, the data connection for the
+    next file is requested (PASV or EPSV) as soon as the final reply to the
+    previous transfer has arrived, and it is being opened while the local
+    file of the previous transfer is closed. For many small files, this
+    saves a round trip per file and hides part of the time for opening the
+    data connections.
+
+    Args:
+      ftp: An FTP instance.
+      files: An iterable of remote filenames or (remotename, localname)
+             tuples. For a remote filename only, the local file has the
+             same name without the directory.
+      blocksize: The maximum number of bytes to read from a data connection
+                 at one time.  [default: 8192]
+
+    Returns:
+      A list of (item, exception) tuples for the items of files, which could
+      not be downloaded. The local files of failed downloads may be
+      incomplete.
+    """
+    buf = memoryview(bytearray(blocksize))
+    stats = ftp.stats
+
+    def transfer(item, fp):
+        remote, local = (item, basename(item)) if isinstance(item, str) else item
+        conn = ftp.transfercmd('RETR ' + remote)
+
+        try:
+            # Only create the local file, if the server sends the data
+            fp = open(local, 'wb')
+            recv_into = getattr(conn, 'recv_into', None) or conn.readinto
+
+            while 1:
+                n = recv_into(buf)
+                if not n:
+                    break
+                fp.write(buf if n == blocksize else buf[:n])
+                if stats is not None:
+                    stats.count(n)
+        except:
+            if fp is not None:
+                fp.close()
+            _abandon(ftp, conn)
+            raise
+
+        conn.close()
+        return fp
+
+    return _transfer_many(ftp, files, transfer)
+
+
+def put_many(ftp, files, blocksize=8192):
+    """Upload many files, one after the other.
+
+    Like ``get_many()``, but the data connection for the next file is also
+    being opened while the next local file is opened.
+
+    Args:
+      ftp: An FTP instance.
+      files: An iterable of local filenames or (localname, remotename)
+             tuples. For a local filename only, the remote file has the
+             same name without the directory.
+      blocksize: The maximum number of bytes to read from a local file at
+                 one time.  [default: 8192]
+
+    Returns:
+      A list of (item, exception) tuples for the items of files, which could
+      not be uploaded.
+    """
+    buf = memoryview(bytearray(blocksize))
+    stats = ftp.stats
+
+    def prepare(item):
+        return open(item if isinstance(item, str) else item[0], 'rb')
+
+    def transfer(item, fp):
+        remote = basename(item) if isinstance(item, str) else item[1]
+
+        try:
+            conn = ftp.transfercmd('STOR ' + remote)
+        except:
+            fp.close()
+            raise
+
+        try:
+            while 1:
+                n = fp.readinto(buf)
+                if not n:
+                    break
+                conn.sendall(buf if n == blocksize else buf[:n])
+                if stats is not None:
+                    stats.count(n)
+
+            # Shut down the TLS layer, or the server may miss the end of the
+            # data
+            ftplib._unwrap(conn)
+        except:
+            fp.close()
+            _abandon(ftp, conn)
+            raise
+
+        conn.close()
+        return fp
+
+    return _transfer_many(ftp, files, transfer, prepare)
+
+
+# Internal: transfer each item of files and collect the errors.
+#
+# prepare(item) opens the local file (for uploads) while the data connection
+# is being opened. transfer(item, fp) is called, when it is established, and
+# returns the local file after sending the data. The file is closed after the
+# final reply was read and the next data connection requested.
+def _transfer_many(ftp, files, transfer, prepare=None):
+    files = list(files)
+    errors = []
+    conn = None
+    # The transfer type only needs to be set once for all files
+    ftp.voidcmd('TYPE I')
+
+    try:
+        for i, item in enumerate(files):
+            if conn is None and ftp.passiveserver:
+                conn = _open_pasv(ftp)
+
+            try:
+                fp = prepare(item) if prepare is not None else None
+            except OSError as exc:
+                # Keep the data connection for the next file
+                errors.append((item, exc))
+                continue
+
+            dataconn, conn = conn, None
+
+            try:
+                ftp._dataconn = _connected(ftp, dataconn)
+                fp = transfer(item, fp)
+            except (ftplib.Error, OSError) as exc:
+                if fp is not None:
+                    fp.close()
+                errors.append((item, exc))
+                continue
+
+            try:
+                ftp._endtransfer()
+            except ftplib.Error as exc:
+                errors.append((item, exc))
+            else:
+                if ftp.passiveserver and i + 1 < len(files):
+                    conn = _open_pasv(ftp)
+            finally:
+                fp.close()
+    finally:
+        if conn is not None:
+            conn.close()
+
+        if ftp._dataconn is not None:
+            ftp._dataconn.close()
+            ftp._dataconn = None
+
+    return errors
+
+
+# Internal: send PASV or EPSV and start connecting to the data port without
+# waiting for the connection to be established (see _connected())
+def _open_pasv(ftp):
+    host, port = ftp.makepasv()
+
+    if _poll is None:
+        return ftp._create_connection((host, port), ftp.timeout, ftp.source_address)
+
+    af, atype, proto, _, addr = ftplib._resolve_addr((host, port))[0]
+    sock = ftplib.socket(af, atype, proto)
+
+    try:
+        if ftp.source_address:
+            sock.bind(ftplib._resolve_addr(ftp.source_address)[0][-1])
+
+        sock.setblocking(False)
+        sock.connect(addr)
+    except OSError as exc:
+        if exc.args[0] not in _IN_PROGRESS:
+            sock.close()
+            raise
+
+    try:
+        sock.family = af
+    except:
+        pass
+
+    return sock
+
+
+# Internal: wait until a data connection opened by _open_pasv() is
+# established and make it blocking again
+def _connected(ftp, conn):
+    if conn is None or _poll is None:
+        return conn
+
+    poller = _poll()
+    poller.register(getattr(conn, '_sock', conn), select.POLLOUT)
+    timeout = ftp.timeout
+
+    if timeout is ftplib._GLOBAL_DEFAULT_TIMEOUT or timeout is None:
+        timeout = -1
+    else:
+        timeout = int(timeout * 1000)
+
+    events = poller.poll(timeout)
+
+    if not events or events[0][1] & (select.POLLERR | select.POLLHUP):
+        conn.close()
+        raise ftplib.Error("Could not open data connection")
+
+    if timeout == -1:
+        conn.setblocking(True)
+    else:
+        conn.settimeout(ftp.timeout)
+
+    return conn
+
+
+# Internal: close the data connection of a failed transfer and read the
+# final reply to the transfer command
+def _abandon(ftp, conn):
+    conn.close()
+
+    try:
+        ftp.getresp()
+    except ftplib.Error:
+        pass
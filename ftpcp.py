@@ -1,17 +1,51 @@
 # -*- coding: utf-8 -*-
 
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
 import ftplib
+from ftplib import sleep_ms
+
+
+class _DummyLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
 
 
 def ftpcp(source, sourcename, target, targetname='', type='I'):
-    """Copy file from one FTP-instance to another."""
-    if not targetname:
-        targetname = sourcename
+    """Copy file from one FTP-instance to another.
 
+    If both are FTP_TLS instances with protected data connections (see
+    ``FTP_TLS.prot_p()``), the target is asked to act as TLS client on the
+    data connection with the SSCN command, or, if it does not support it, the
+    source with the CPSV command.
+    """
     type = 'TYPE ' + type
     source.voidcmd(type)
     target.voidcmd(type)
-    sourcehost, sourceport = ftplib.parse227(source.sendcmd('PASV'))
+    _copy(source, sourcename, target, targetname)
+
+
+# Internal: copy a file directly between servers, the transfer type must
+# already be set on both.
+def _copy(source, sourcename, target, targetname=''):
+    if not targetname:
+        targetname = sourcename
+
+    pasv = 'PASV'
+    prot_p = getattr(source, '_prot_p', False)
+
+    if prot_p != getattr(target, '_prot_p', False):
+        raise ValueError("Data connection protection of source and target differs")
+    elif prot_p and not target._sscn:
+        pasv = _secure_pasv(source, target)
+
+    sourcehost, sourceport = ftplib.parse227(source.sendcmd(pasv))
     target.sendport(sourcehost, sourceport)
     # RFC 959: the user must "listen" [...] BEFORE sending the
     # transfer request.
@@ -21,9 +55,152 @@ def ftpcp(source, sourcename, target, targetname='', type='I'):
     if treply[:3] not in {'125', '150'}:
         raise ftplib.error_proto  # RFC 959
 
-    sreply = source.sendcmd('RETR ' + sourcename)
+    try:
+        sreply = source.sendcmd('RETR ' + sourcename)
+    except ftplib.Error:
+        # The target is waiting for data, which will never come
+        target._abort_transfer()
+        raise
+
     if sreply[:3] not in {'125', '150'}:
         raise ftplib.error_proto  # RFC 959
 
-    source.voidresp()
+    try:
+        source.voidresp()
+    except ftplib.Error:
+        # Read the final reply of the target too, so the next command on its
+        # session doesn't get it
+        try:
+            target.voidresp()
+        except ftplib.Error:
+            pass
+        raise
+
     target.voidresp()
+
+
+# Internal: with protected data connections, one of the servers must act as
+# TLS client in the handshake. Ask the target to do so with SSCN or, if it
+# doesn't support that, the source with CPSV, which is PASV otherwise.
+def _secure_pasv(source, target):
+    # target._sscn is None, if it is known not to support SSCN
+    if target._sscn is False:
+        try:
+            target.sscn(True)
+            return 'PASV'
+        except ftplib.error_perm as exc:
+            # Command not recognized / implemented?
+            if exc.args[0][:3] not in {'500', '502', '504'}:
+                raise
+
+            target._sscn = None
+
+    return 'CPSV'
+
+
+def ftpcp_many(source, target, files, type='I', pool=None, streams=1, wait=60):
+    """Copy many files from one server to another.
+
+    The transfer type is set only once per pair of sessions. Error replies
+    for single files don't stop the batch, they are collected and returned.
+
+    Args:
+      source, target: The FTP instances to copy from and to. If pool is given,
+                      dictionaries of keyword arguments for ``pool.checkout()``
+                      (e.g. host, user and passwd) instead.
+      files: An iterable of (sourcename, targetname) tuples. If targetname is
+             empty, sourcename is used for it.
+      type: The transfer type.  [default: 'I']
+      pool: An optional ``ftppool.FTPPool``, from which sessions for
+            several transfers at once are taken.  [default: None]
+      streams: The number of transfers to run at once, in separate threads,
+               each using a pair of sessions from the pool. Limited by the
+               pool's max_per_host, or half of it, if source and target are
+               on the same host. Without thread support, files are copied
+               one after another.  [default: 1]
+      wait: The maximum time in seconds to wait for a session from the pool
+            (see ``pool.checkout()``), before ftplib.Error is raised.
+            [default: 60]
+
+    Returns:
+      A list of ((sourcename, targetname), exception) tuples for the files,
+      which could not be copied.
+    """
+    # Files yet to be copied are popped from the end
+    files = list(files)
+    files.reverse()
+    errors = []
+
+    if pool is not None:
+        # Each stream holds a session to each host, which count against the
+        # same limit, if both are the same. More streams could deadlock.
+        if source.get('host') == target.get('host'):
+            streams = min(streams, pool.max_per_host // 2)
+        else:
+            streams = min(streams, pool.max_per_host)
+
+        source = dict(source, wait=wait)
+        target = dict(target, wait=wait)
+
+    if pool is None:
+        _copy_batch(source, target, files, type, errors, _DummyLock())
+    elif _thread is None or streams <= 1:
+        with pool.connection(**source) as src, pool.connection(**target) as dst:
+            _copy_batch(src, dst, files, type, errors, _DummyLock())
+    else:
+        state = {'workers': streams, 'exc': None}
+        lock = _thread.allocate_lock()
+
+        for _ in range(streams):
+            _thread.start_new_thread(_copy_worker, (pool, source, target, files, type, errors,
+                                                    lock, state))
+
+        while state['workers']:
+            sleep_ms(10)
+
+        # All streams failed before copying all files
+        if files and state['exc'] is not None:
+            raise state['exc']
+
+    return errors
+
+
+# Internal: copy the files popped from the end of a list
+def _copy_batch(source, target, files, type, errors, lock):
+    type = 'TYPE ' + type
+    source.voidcmd(type)
+    target.voidcmd(type)
+
+    while True:
+        with lock:
+            if not files:
+                break
+            item = files.pop()
+
+        try:
+            _copy(source, item[0], target, item[1])
+        except ftplib.Error as exc:
+            with lock:
+                errors.append((item, exc))
+        except:
+            # Leave the file to the remaining streams
+            with lock:
+                files.append(item)
+            raise
+
+
+def _copy_worker(pool, source, target, files, type, errors, lock, state):
+    error = None
+
+    try:
+        with pool.connection(**source) as src, pool.connection(**target) as dst:
+            _copy_batch(src, dst, files, type, errors, lock)
+    except Exception as exc:
+        # The remaining streams copy the files left; if there are none,
+        # ftpcp_many() raises the error
+        error = exc
+    finally:
+        with lock:
+            if error is not None:
+                state['exc'] = error
+            state['workers'] -= 1
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Download a file in segments over several FTP connections in parallel.
+
+Example::
+
+    >>> from ftplib import FTP
+    >>> from ftpdownload import download_segmented
+    >>> def connect():
+    ...     return FTP('example.com', user='username', passwd='password')
+    ...
+    >>> download_segmented(connect, 'firmware.bin', 'firmware.bin', segments=4)
+    1048576
+
+"""
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+# Don't split files into segments smaller than this
+MIN_SEGMENT_SIZE = 65536
+
+
+class _DummyLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _fetch_segment(ftp, path, fp, lock, start, end, blocksize, last):
+    buf = bytearray(blocksize)
+    mv = memoryview(buf)
+    pos = start
+    conn = ftp.transfercmd('RETR ' + path, start or None)
+
+    try:
+        if hasattr(conn, 'recv_into'):
+            recv_into = conn.recv_into
+        else:
+            recv_into = conn.readinto
+
+        while 1:
+            n = recv_into(mv)
+            if not n:
+                break
+
+            n = min(n, end - pos)
+            with lock:
+                fp.seek(pos)
+                fp.write(mv if n == blocksize else mv[:n])
+            pos += n
+
+            if pos >= end and not last:
+                break
+    except:
+        conn.close()
+        raise
+
+    if pos < end:
+        conn.close()
+        raise EOFError("segment %i-%i of '%s' ended prematurely at %i" %
+                       (start, end, path, pos))
+
+    if last:
+        conn.close()
+        ftp.voidresp()
+    else:
+        # Stop the transfer at the segment boundary
+        ftp._abort_transfer(conn)
+
+    return pos - start
+
+
+def _run_segment(factory, path, fp, lock, start, end, blocksize, last, done, errors):
+    try:
+        with factory() as ftp:
+            ftp.voidcmd('TYPE I')
+            _fetch_segment(ftp, path, fp, lock, start, end, blocksize, last)
+    except Exception as exc:
+        errors.append(exc)
+    finally:
+        done.release()
+
+
+def download_segmented(factory, path, dest, segments=4, blocksize=8192, size=None):
+    """Download a file in segments over several FTP connections in parallel.
+
+    Each segment is retrieved over its own FTP session, starting at the
+    segment's offset via a REST command and stopping at its end with an ABOR
+    command, and written into place in the destination file.
+
+    Args:
+      factory: A callable, which returns a new, connected and logged-in
+               FTP (or FTP_TLS) instance.
+      path: The path of the remote file.
+      dest: The path of the local destination file.
+      segments: The maximum number of segments and hence connections.
+                [default: 4]
+      blocksize: The maximum number of bytes to read from each data
+                 connection at one time.  [default: 8192]
+      size: The size of the remote file. Determined with a SIZE command
+            if not given.  [default: None]
+
+    Returns:
+      The number of bytes downloaded.
+
+    Files smaller than ``segments * MIN_SEGMENT_SIZE`` are split into fewer
+    segments. When threads are not supported, segments are downloaded one
+    after another.
+    """
+    with factory() as ftp:
+        # Binary mode is also needed for SIZE by some servers
+        ftp.voidcmd('TYPE I')
+
+        if size is None:
+            size = ftp.size(path)
+
+            if size is None:
+                raise ValueError("could not determine size of '%s'" % path)
+
+        segments = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+        seglen = -(-size // segments)
+        bounds = [(i * seglen, min(size, (i + 1) * seglen)) for i in range(segments)]
+
+        with open(dest, 'wb') as fp:
+            if not size:
+                return 0
+
+            # Allocate the whole file, so segments can be written in any order
+            fp.seek(size - 1)
+            fp.write(b'\0')
+
+            if _thread is None:
+                lock = _DummyLock()
+                for i, (start, end) in enumerate(bounds):
+                    _fetch_segment(ftp, path, fp, lock, start, end, blocksize,
+                                   i == segments - 1)
+            else:
+                lock = _thread.allocate_lock()
+                done = []
+                errors = []
+
+                try:
+                    for i, (start, end) in enumerate(bounds[1:], 1):
+                        seglock = _thread.allocate_lock()
+                        seglock.acquire()
+                        _thread.start_new_thread(
+                            _run_segment, (factory, path, fp, lock, start, end, blocksize,
+                                           i == segments - 1, seglock, errors))
+                        done.append(seglock)
+
+                    # Use the first connection for the first segment
+                    _fetch_segment(ftp, path, fp, lock, 0, bounds[0][1], blocksize,
+                                   segments == 1)
+                finally:
+                    # Wait for all other segments to finish
+                    for seglock in done:
+                        seglock.acquire()
+
+                if errors:
+                    raise errors[0]
+
+    return size
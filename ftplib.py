@@ -38,9 +38,29 @@ try:
 except ImportError:
     import usocket as _socket
 
+try:
+    from time import sleep_ms, ticks_diff, ticks_ms, ticks_us
+except ImportError:
+    # CPython
+    from time import monotonic as _monotonic, sleep as _sleep
+
+    def sleep_ms(ms):
+        _sleep(ms / 1000)
+
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+    def ticks_ms():
+        return int(_monotonic() * 1000)
+
+    def ticks_us():
+        return int(_monotonic() * 1000000)
+
+
 __all__ = (
     "Error",
     "FTP",
+    "Reply",
     "error_perm",
     "error_proto",
     "error_reply",
@@ -90,6 +110,40 @@ class error_proto(Error):
     pass
 
 
+class Reply:
+    """A response of the server, as returned by ``FTP.getreply()``.
+
+    Attributes:
+      code: The three-digit reply code as a string, e.g. '226'.
+      text: The complete response as a string, as returned by
+            ``FTP.getresp()``. If text is passed as bytes, both attributes
+            are only decoded when accessed.
+    """
+
+    __slots__ = ('_text',)
+
+    def __init__(self, text):
+        self._text = text
+
+    @property
+    def code(self):
+        text = self._text
+        return text[:3] if isinstance(text, str) else text[:3].decode()
+
+    @property
+    def text(self):
+        text = self._text
+        if not isinstance(text, str):
+            text = self._text = text.decode()
+        return text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return 'Reply(%r)' % self.text
+
+
 def _resolve_addr(addr):
     if isinstance(addr, (bytes, bytearray)):
         return addr
@@ -107,6 +161,19 @@ def _resolve_addr(addr):
     return _socket.getaddrinfo(host, addr[1], af, _socket.SOCK_STREAM)
 
 
+def _unwrap(conn):
+    """Shut down the SSL layer of a data connection, if it has one.
+
+    Errors are ignored: e.g. the handshake is not finished yet, if no data
+    was exchanged (an empty listing), and the connection is closed anyway.
+    """
+    if _SSLSocket is not None and isinstance(conn, _SSLSocket):
+        try:
+            conn.unwrap()
+        except (OSError, ValueError):
+            pass
+
+
 if getattr(_socket, 'SocketType', None):
     socket = _socket.socket
 else:
@@ -128,11 +195,30 @@ else:
             else:
                 return self._sock.read(size)
 
-        def sendall(self, *args):
-            if hasattr(self._sock, 'send'):
-                return self._sock.send(*args)
+        def recv_into(self, buf, nbytes=0):
+            if nbytes:
+                buf = memoryview(buf)[:nbytes]
+
+            if hasattr(self._sock, 'recv_into'):
+                return self._sock.recv_into(buf)
             else:
-                return self._sock.write(*args)
+                return self._sock.readinto(buf)
+
+        def sendall(self, data, flags=0):
+            # Flags like MSG_OOB are ignored, since send() of MicroPython
+            # sockets (e.g. lwIP on ESP32 and rp2) only takes the data
+            if not hasattr(self._sock, 'send'):
+                return self._sock.write(data)
+
+            # send() may not send all data at once
+            n = self._sock.send(data)
+            size = len(data)
+
+            if n is not None and n < size:
+                mv = memoryview(data)
+
+                while n < size:
+                    n += self._sock.send(mv[n:])
 
         def __getattr__(self, name):
             return getattr(self._sock, name)
@@ -191,6 +277,24 @@ class FTP:
     welcome = None
     passiveserver = 1
     encoding = "latin-1"
+    # Whether the server supports MLSD (None: not known yet)
+    use_mlsd = None
+    # Whether to use EPSV instead of PASV with IPv4 (None: if the server is
+    # known to support it, see features())
+    use_epsv = None
+    # Features of the servers per host and port, see features()
+    feature_cache = {}
+    # Whether to get listings with STAT instead of LIST, see dir()
+    use_stat = False
+    # Transfer statistics recorder, e.g. an ftpstats.TransferStats instance
+    stats = None
+    # A passive data connection opened in advance for the next transfer, see
+    # ftpbatch.get_many()
+    _dataconn = None
+    # Limits for blocksize='auto' and the best block size found per host
+    min_blocksize = 1024
+    max_blocksize = 65536
+    auto_blocksizes = {}
 
     def __init__(self, host=None, port=None, user=None, passwd=None, acct=None,
                  timeout=_GLOBAL_DEFAULT_TIMEOUT, source_address=None):
@@ -328,33 +432,57 @@ class FTP:
 
         self.putline(line)
 
-    # Internal: return one line from the server, stripping CRLF.
+    # Internal: return one line from the server as bytes, stripping CRLF.
     # Raise EOFError if the connection is closed
-    def getline(self):
-        line = self.file.readline(self.maxline + 1).decode()
+    def _getrawline(self):
+        line = self.file.readline(self.maxline + 1)
         if len(line) > self.maxline:
             raise Error("got more than %d bytes" % self.maxline)
         if self.debugging > 1:
-            print('*get*', self.sanitize(line))
+            print('*get*', self.sanitize(line.decode()))
         if not line:
             raise EOFError
-        return line.rstrip('\r\n')
+        return line.rstrip(B_CRLF)
+
+    # Internal: return one line from the server, stripping CRLF.
+    # Raise EOFError if the connection is closed
+    def getline(self):
+        return self._getrawline().decode()
+
+    # Internal: get a response from the server as bytes, which may possibly
+    # consist of multiple lines, separated by b'\n' (then as bytearray).
+    def _getrawmultiline(self):
+        line = self._getrawline()
+        if line[3:4] == b'-':
+            code = line[:3]
+            # Append the lines to a buffer, which is returned, rather than
+            # joining them in the end, so the lines are not kept twice
+            line = bytearray(line)
+            while 1:
+                nextline = self._getrawline()
+                line += b'\n'
+                line += nextline
+                if nextline[:3] == code and nextline[3:4] != b'-':
+                    break
+        return line
 
     # Internal: get a response from the server, which may possibly
     # consist of multiple lines.  Return a single string with no
     # trailing CRLF.  If the response consists of multiple lines,
     # these are separated by '\n' characters in the string
     def getmultiline(self):
-        line = self.getline()
-        if line[3:4] == '-':
-            code = line[:3]
-            while 1:
-                nextline = self.getline()
-                line = line + (b'\n' + nextline)
-                if nextline[:3] == code and \
-                        nextline[3:4] != '-':
-                    break
-        return line
+        return self._getrawmultiline().decode()
+
+    @property
+    def lastresp(self):
+        """The reply code of the last response as a string, e.g. '226'."""
+        # The last response, as string or bytes, which is decoded on access
+        resp = self._lastresp
+        return resp[:3] if isinstance(resp, str) else resp[:3].decode()
+
+    @lastresp.setter
+    def lastresp(self, resp):
+        self._lastresp = resp
 
     # Internal: get a response from the server.
     # Raise various errors if the response indicates an error
@@ -363,7 +491,7 @@ class FTP:
         if self.debugging:
             print('*resp*', self.sanitize(resp))
 
-        self.lastresp = resp[:3]
+        self._lastresp = resp
         c = resp[:1]
 
         if c in {'1', '2', '3'}:
@@ -381,6 +509,44 @@ class FTP:
             raise error_reply(resp)
         return resp
 
+    # Internal: get a response from the server as bytes, checking the reply
+    # code without decoding the response.
+    # Raise various errors if the response indicates an error
+    def _getrawresp(self):
+        line = self._getrawmultiline()
+        if self.debugging:
+            print('*resp*', self.sanitize(line.decode()))
+
+        self._lastresp = line
+        c = line[:1]
+
+        if c in (b'1', b'2', b'3'):
+            return line
+        if c == b'4':
+            raise error_temp(line.decode())
+        if c == b'5':
+            raise error_perm(line.decode())
+        raise error_proto(line.decode())
+
+    # Internal: like _getrawresp(), but expect a response beginning with '2'
+    def _voidrawresp(self):
+        line = self._getrawresp()
+        if line[:1] != b'2':
+            raise error_reply(line.decode())
+        return line
+
+    def getreply(self):
+        """Get a response from the server as a ``Reply``.
+
+        Like ``getresp()``, but the text of the response is only decoded
+        when it is accessed.
+        """
+        return Reply(self._getrawresp())
+
+    def voidreply(self):
+        """Like ``getreply()``, but expect a response beginning with '2'."""
+        return Reply(self._voidrawresp())
+
     def abort(self):
         """Abort a file transfer.
 
@@ -402,6 +568,32 @@ class FTP:
 
         return resp
 
+    # Internal: close the data connection of an unfinished transfer (if there
+    # is one on this side, e.g. not for server-to-server copies) and abort it.
+    # The server replies to both the transfer command (426, or 226 if it was
+    # complete) and the ABOR command, so after abort() has read the former,
+    # read the latter too. If no data was transferred yet, some servers (e.g.
+    # pyftpdlib) only reply to ABOR with 225.
+    def _abort_transfer(self, conn=None):
+        if conn is not None:
+            conn.close()
+        resp = self.abort()
+        if resp[:3] == '225':
+            return resp
+        return self.getresp()
+
+    # Internal: read the final response of a transfer and, if enabled, record
+    # the end of its phases in the transfer statistics.
+    def _endtransfer(self):
+        stats = self.stats
+        if stats is None:
+            return self.voidresp()
+
+        stats.mark('data')
+        resp = self.voidresp()
+        stats.end(resp)
+        return resp
+
     def sendcmd(self, cmd):
         """Send a command and return the response."""
         self.putcmd(cmd)
@@ -412,6 +604,16 @@ class FTP:
         self.putcmd(cmd)
         return self.voidresp()
 
+    # Internal: like sendcmd(), but return the response as bytes
+    def _sendrawcmd(self, cmd):
+        self.putcmd(cmd)
+        return self._getrawresp()
+
+    # Internal: like voidcmd(), but return the response as bytes
+    def _voidrawcmd(self, cmd):
+        self.putcmd(cmd)
+        return self._voidrawresp()
+
     def sendport(self, host, port):
         """Send a PORT command with current host and given port number.
         """
@@ -498,12 +700,19 @@ class FTP:
         return sock
 
     def makepasv(self):
-        if self.af == _socket.AF_INET:
+        epsv = self.use_epsv
+
+        if epsv is None:
+            # Only if FEAT was already sent, e.g. for a listing
+            features = self.feature_cache.get(self._feature_key())
+            epsv = features is not None and 'EPSV' in features
+
+        if self.af == _socket.AF_INET and not epsv:
             host, port = parse227(self.sendcmd('PASV'))
         else:
             port = parse229(self.sendcmd('EPSV'))
             try:
-                host = self.sock.getpeername()
+                host = self.sock.getpeername()[0]
             except AttributeError:
                 # XXX: getpeername() is not supported by usocket!
                 host = self.host
@@ -524,53 +733,77 @@ class FTP:
         the server to skip over any data up to the given marker.
         """
         size = None
+        stats = self.stats
+        if stats is not None:
+            stats.begin(cmd)
+
         if self.passiveserver:
-            host, port = self.makepasv()
-            conn = self._create_connection((host, port), self.timeout,
-                                           self.source_address)
+            conn, self._dataconn = self._dataconn, None
+
+            if conn is None:
+                host, port = self.makepasv()
+                if stats is not None:
+                    stats.mark('pasv')
+
+                conn = self._create_connection((host, port), self.timeout,
+                                               self.source_address)
+                if stats is not None:
+                    stats.mark('connect')
+
             try:
                 if rest is not None:
-                    self.sendcmd("REST %s" % rest)
+                    self._sendrawcmd("REST %s" % rest)
 
-                resp = self.sendcmd(cmd)
+                resp = self._sendrawcmd(cmd)
                 # Some servers apparently send a 200 reply to
                 # a LIST or STOR command, before the 150 reply
                 # (and way before the 226 reply). This seems to
                 # be in violation of the protocol (which only allows
                 # 1xx or error messages for LIST), so we just discard
                 # this response.
-                if resp[0] == '2':
-                    resp = self.getresp()
+                if resp[:1] == b'2':
+                    resp = self._getrawresp()
 
-                if resp[0] != '1':
-                    raise error_reply(resp)
+                if resp[:1] != b'1':
+                    raise error_reply(resp.decode())
             except:
                 conn.close()
                 raise
+
+            if stats is not None:
+                stats.mark('reply')
         else:
             sock = self.makeport()
+            if stats is not None:
+                stats.mark('port')
 
             try:
                 if rest is not None:
-                    self.sendcmd("REST %s" % rest)
+                    self._sendrawcmd("REST %s" % rest)
 
-                resp = self.sendcmd(cmd)
+                resp = self._sendrawcmd(cmd)
                 # See above.
-                if resp[0] == '2':
-                    resp = self.getresp()
+                if resp[:1] == b'2':
+                    resp = self._getrawresp()
 
-                if resp[0] != '1':
-                    raise error_reply(resp)
+                if resp[:1] != b'1':
+                    raise error_reply(resp.decode())
+
+                if stats is not None:
+                    stats.mark('reply')
 
                 conn, _ = sock.accept()
                 if self.timeout is not _GLOBAL_DEFAULT_TIMEOUT:
                     conn.settimeout(self.timeout)
+
+                if stats is not None:
+                    stats.mark('accept')
             finally:
                 sock.close()
 
-        if resp.startswith('150'):
+        if resp[:3] == b'150':
             # this is conditional in case we received a 125
-            size = parse150(resp)
+            size = parse150(resp.decode())
 
         return conn, size
 
@@ -620,25 +853,82 @@ class FTP:
           callback: A single parameter callable to be called on each
                     block of data read.
           blocksize: The maximum number of bytes to read from the
-                     socket at one time.  [default: 8192]
+                     socket at one time, or 'auto' to adjust it during the
+                     transfer (see _BlockSizeTuner).  [default: 8192]
           rest: Passed to transfercmd().  [default: None]
 
         Returns:
           The response code.
         """
-        self.voidcmd('TYPE I')
+        if self.stats is not None:
+            callback = self.stats.wrap(callback)
+
+        tuner = None
+        if blocksize == 'auto':
+            tuner = _BlockSizeTuner(self)
+            blocksize = tuner.blocksize
+
+        self._voidrawcmd('TYPE I')
         with self.transfercmd(cmd, rest) as conn:
+            if tuner is not None:
+                tuner.reset()
             while 1:
                 data = conn.recv(blocksize)
                 if not data:
                     break
                 callback(data)
+                if tuner is not None:
+                    blocksize = tuner.update(len(data))
 
             # shutdown ssl layer
-            if _SSLSocket is not None and isinstance(conn, _SSLSocket):
-                conn.unwrap()
+            _unwrap(conn)
 
-        return self.voidresp()
+        return self._endtransfer()
+
+    def retrbinary_into(self, cmd, callback, buf, rest=None):
+        """Retrieve data in binary mode into a pre-allocated buffer.
+
+        Like retrbinary(), but instead of allocating a new bytes object for
+        each block, data is read directly into the given buffer (using
+        recv_into() or readinto()) and the callback is passed a memoryview
+        of the filled part of it. Since the buffer is re-used for the next
+        block, the callback must consume or copy the data before returning.
+
+        Args:
+          cmd: A RETR command.
+          callback: A single parameter callable to be called with a
+                    memoryview of each block of data read.
+          buf: A writable buffer object (e.g. a bytearray). Its size
+               determines the maximum number of bytes read from the socket
+               at one time.
+          rest: Passed to transfercmd().  [default: None]
+
+        Returns:
+          The response code.
+        """
+        if self.stats is not None:
+            callback = self.stats.wrap(callback)
+
+        mv = memoryview(buf)
+        size = len(mv)
+        self._voidrawcmd('TYPE I')
+        with self.transfercmd(cmd, rest) as conn:
+            if hasattr(conn, 'recv_into'):
+                recv_into = conn.recv_into
+            else:
+                recv_into = conn.readinto
+
+            while 1:
+                n = recv_into(mv)
+                if not n:
+                    break
+                # Only slice (and hence allocate) for short reads
+                callback(mv if n == size else mv[:n])
+
+            # shutdown ssl layer
+            _unwrap(conn)
+
+        return self._endtransfer()
 
     def retrlines(self, cmd, callback=None):
         """Retrieve data in line mode.
@@ -657,9 +947,29 @@ class FTP:
         if callback is None:
             callback = print
 
-        self.sendcmd('TYPE A')
+        if self.stats is not None:
+            # The line endings were stripped
+            callback = self.stats.wrap(callback, 2)
 
-        with self.transfercmd(cmd) as conn:
+        lines = self._iterlines(cmd)
+        try:
+            for line in lines:
+                callback(line)
+        finally:
+            lines.close()
+
+        return self._endtransfer()
+
+    # Internal: generator yielding the lines of a transfer in line mode with
+    # the trailing CRLF stripped. The final response is left for the caller
+    # to read. If the generator is closed before all lines were read, the
+    # transfer is aborted, so the control connection remains usable.
+    def _iterlines(self, cmd):
+        self._sendrawcmd('TYPE A')
+        conn = self.transfercmd(cmd)
+        complete = False
+
+        try:
             if hasattr(conn, 'makefile'):
                 fp = conn.makefile('rb')
             else:
@@ -682,15 +992,18 @@ class FTP:
                 elif line[-1:] == '\n':
                     line = line[:-1]
 
-                callback(line)
+                yield line
 
             # shutdown ssl layer
-            if _SSLSocket is not None and isinstance(conn, _SSLSocket):
-                conn.unwrap()
+            _unwrap(conn)
 
             fp.close()
-
-        return self.voidresp()
+            complete = True
+        finally:
+            if complete:
+                conn.close()
+            else:
+                self._abort_transfer(conn)
 
     def storbinary(self, cmd, fp, blocksize=8192, callback=None, rest=None):
         """Store a file in binary mode.
@@ -701,7 +1014,8 @@ class FTP:
           cmd: A STOR command.
           fp: A file-like object with a read(num_bytes) method.
           blocksize: The maximum data size to read from fp and send over
-                     the connection at once.  [default: 8192]
+                     the connection at once, or 'auto' to adjust it during
+                     the transfer (see _BlockSizeTuner).  [default: 8192]
           callback: An optional single parameter callable that is called on
                     each block of data after it is sent.  [default: None]
           rest: Passed to transfercmd().  [default: None]
@@ -709,8 +1023,18 @@ class FTP:
         Returns:
           The response code.
         """
-        self.voidcmd('TYPE I')
+        if self.stats is not None:
+            callback = self.stats.wrap(callback)
+
+        tuner = None
+        if blocksize == 'auto':
+            tuner = _BlockSizeTuner(self)
+            blocksize = tuner.blocksize
+
+        self._voidrawcmd('TYPE I')
         with self.transfercmd(cmd, rest) as conn:
+            if tuner is not None:
+                tuner.reset()
             while 1:
                 buf = fp.read(blocksize)
                 if not buf:
@@ -719,12 +1043,56 @@ class FTP:
                 conn.sendall(buf)
                 if callback:
                     callback(buf)
+                if tuner is not None:
+                    blocksize = tuner.update(len(buf))
 
             # shutdown ssl layer
-            if _SSLSocket is not None and isinstance(conn, _SSLSocket):
-                conn.unwrap()
+            _unwrap(conn)
 
-        return self.voidresp()
+        return self._endtransfer()
+
+    def storbinary_from(self, cmd, fp, buf, callback=None, rest=None):
+        """Store a file in binary mode using a pre-allocated buffer.
+
+        Like storbinary(), but instead of allocating a new bytes object for
+        each block, data is read from fp into the given buffer with
+        fp.readinto() and sent from a memoryview of it.
+
+        Args:
+          cmd: A STOR command.
+          fp: A file-like object with a readinto(buffer) method.
+          buf: A writable buffer object (e.g. a bytearray). Its size
+               determines the maximum data size read from fp and sent over
+               the connection at once.
+          callback: An optional single parameter callable that is called
+                    with a memoryview of each block of data after it is
+                    sent.  [default: None]
+          rest: Passed to transfercmd().  [default: None]
+
+        Returns:
+          The response code.
+        """
+        if self.stats is not None:
+            callback = self.stats.wrap(callback)
+
+        mv = memoryview(buf)
+        size = len(mv)
+        self._voidrawcmd('TYPE I')
+        with self.transfercmd(cmd, rest) as conn:
+            while 1:
+                n = fp.readinto(mv)
+                if not n:
+                    break
+
+                data = mv if n == size else mv[:n]
+                conn.sendall(data)
+                if callback:
+                    callback(data)
+
+            # shutdown ssl layer
+            _unwrap(conn)
+
+        return self._endtransfer()
 
     def storlines(self, cmd, fp, callback=None):
         """Store a file in line mode.
@@ -740,7 +1108,10 @@ class FTP:
         Returns:
           The response code.
         """
-        self.voidcmd('TYPE A')
+        if self.stats is not None:
+            callback = self.stats.wrap(callback)
+
+        self._voidrawcmd('TYPE A')
         with self.transfercmd(cmd) as conn:
             while 1:
                 buf = fp.readline(self.maxline + 1)
@@ -756,10 +1127,9 @@ class FTP:
                 if callback:
                     callback(buf)
             # shutdown ssl layer
-            if _SSLSocket is not None and isinstance(conn, _SSLSocket):
-                conn.unwrap()
+            _unwrap(conn)
 
-        return self.voidresp()
+        return self._endtransfer()
 
     def acct(self, password):
         """Send new account name."""
@@ -784,10 +1154,100 @@ class FTP:
         By default list current directory to stdout. Optional last argument is
         callback function; all non-empty arguments before it are concatenated
         to the LIST command.  (This *should* only be used for a pathname.)
+
+        If ``use_stat`` is true, the listing is requested with the STAT
+        command and sent in the reply on the control connection, which saves
+        opening a data connection. If the server refuses, LIST is used and
+        ``use_stat`` is set to False.
         """
         func = kw.get('callback')
+
+        if self.use_stat:
+            lines = self._statlines(" ".join(args))
+
+            if lines is not None:
+                for line in lines:
+                    (func or print)(line)
+                return
+
         self.retrlines(" ".join(['LIST'] + list(args)), func)
 
+    # Internal: return the lines of a listing of path in the reply to the
+    # STAT command. Return None and set use_stat to False, if the server
+    # refuses to send it.
+    def _statlines(self, path):
+        try:
+            # Without an argument, STAT returns the status of the server
+            resp = self.sendcmd('STAT ' + (path or '.'))
+        except error_perm as exc:
+            # Command not recognized / implemented?
+            if exc.args[0][:3] not in {'500', '502', '504'}:
+                raise
+
+            resp = ''
+
+        if resp[:3] not in {'211', '212', '213'} or '\n' not in resp:
+            self.use_stat = False
+            return None
+
+        # The listing is between the first and the last line, which some
+        # servers indent
+        return [line.lstrip(' ') for line in resp.split('\n')[1:-1]]
+
+    def features(self, refresh=False):
+        """Return the features supported by the server (RFC-2389).
+
+        Returns a dictionary mapping the names of the features listed in the
+        reply to the FEAT command to their parameters, e.g. {'MLST':
+        'type*;size*;modify*;', 'REST': 'STREAM', 'SIZE': '', ...}, or None
+        if the server does not support the FEAT command.
+
+        The result is cached per host and port in the class attribute
+        ``feature_cache``, so the command is only sent once for all
+        connections to the same server, e.g. those of a connection pool.
+        Pass a true value for refresh to send it again.
+
+        Listings use MLSD or LIST depending on the features. Once they are
+        known, passive transfers use EPSV instead of PASV, if supported, and
+        ``size()`` uses MLST, if the server does not support SIZE.
+        """
+        key = self._feature_key()
+
+        if refresh or key not in self.feature_cache:
+            try:
+                resp = self.sendcmd('FEAT')
+            except error_perm as exc:
+                # Command not recognized / implemented?
+                if exc.args[0][:3] not in {'500', '502'}:
+                    raise
+
+                features = None
+            else:
+                features = {}
+
+                # Features are listed between the first and the last line
+                for line in resp.split('\n')[1:-1]:
+                    name, _, params = line.strip().partition(' ')
+                    features[name.upper()] = params
+
+            self.feature_cache[key] = features
+
+        return self.feature_cache[key]
+
+    def _feature_key(self):
+        return '%s:%s' % (self.host, self.port)
+
+    # Internal: whether to try MLSD for a listing. If not known yet, it is
+    # decided by the features of the server, or, without FEAT support, tried.
+    def _mlsd_supported(self):
+        if self.use_mlsd is None:
+            features = self.features()
+
+            if features is not None:
+                self.use_mlsd = 'MLST' in features
+
+        return self.use_mlsd is not False
+
     def mlsd(self, path="", facts=[]):
         """List a directory in a standardized format by using MLSD command
         (RFC-3659).
@@ -800,6 +1260,9 @@ class FTP:
         file found in path. First element is the file name, the second one is a
         dictionary including a variable number of "facts" depending on the
         server and whether "facts" argument has been provided.
+
+        Entries are yielded while the listing is still being received. If the
+        generator is closed before it is exhausted, the transfer is aborted.
         """
         if facts:
             self.sendcmd("OPTS MLST " + ";".join(facts) + ";")
@@ -808,18 +1271,104 @@ class FTP:
         else:
             cmd = "MLSD"
 
-        lines = []
-        self.retrlines(cmd, lines.append)
+        lines = self._iterlines(cmd)
+        try:
+            for line in lines:
+                yield parse_mlsx(line)
+        finally:
+            # Aborts the transfer, if the generator was closed early
+            lines.close()
+
+        self._endtransfer()
 
-        for line in lines:
-            facts_found, _, name = line.rstrip(CRLF).partition(' ')
-            entry = {}
+    def mlst(self, path="", facts=[]):
+        """Return the facts of a single file or directory by using the MLST
+        command (RFC-3659).
 
-            for fact in facts_found[:-1].split(";"):
-                key, _, value = fact.partition("=")
-                entry[key.lower()] = value
+        If path is omitted the current directory is assumed. See ``mlsd()``
+        for the meaning of "facts".
 
-            yield (name, entry)
+        Return a (name, facts) tuple like those yielded by ``mlsd()``. The
+        facts are sent in the reply on the control connection, so, unlike
+        ``mlsd()``, no data connection is needed.
+        """
+        if facts:
+            self.sendcmd("OPTS MLST " + ";".join(facts) + ";")
+
+        return parse_mlst(self.voidcmd("MLST %s" % path if path else "MLST"))
+
+    def walk(self, top='', onerror=None):
+        """Walk a directory tree top-down, like os.walk().
+
+        Return a generator object yielding a (dirpath, dirnames, filenames)
+        tuple for top and each directory below it. As with os.walk(), the
+        caller may remove names from dirnames to skip those directories.
+
+        Directories are listed with the MLSD command, or, if the server does
+        not support it, with LIST (see ftplisting.list_parsed()). Symbolic
+        links are listed as files and not followed.
+
+        Errors listing a directory are ignored, unless onerror is given, in
+        which case it is called with the exception.
+        """
+        stack = [top]
+
+        while stack:
+            path = stack.pop()
+
+            try:
+                dirnames, filenames = self.listdir(path)
+            except Error as exc:
+                if onerror is not None:
+                    onerror(exc)
+                continue
+
+            yield path, dirnames, filenames
+
+            for name in reversed(dirnames):
+                stack.append(joinpath(path, name))
+
+    def listdir(self, path=''):
+        """Return the names of subdirectories and other entries of a directory.
+
+        Returns a (dirnames, filenames) tuple of lists. Uses MLSD, or LIST if
+        the server does not support it, or STAT if ``use_stat`` is true.
+        """
+        dirnames = []
+        filenames = []
+
+        # A listing with STAT needs no data connection; names and types are
+        # parsed reliably from it
+        if not self.use_stat and self._mlsd_supported():
+            try:
+                for name, facts in self.mlsd(path):
+                    type = facts.get('type')
+
+                    if type == 'dir':
+                        dirnames.append(name)
+                    elif type not in ('cdir', 'pdir'):
+                        filenames.append(name)
+
+                self.use_mlsd = True
+                return dirnames, filenames
+            except error_perm as exc:
+                # Command not recognized / implemented?
+                if self.use_mlsd or exc.args[0][:3] not in {'500', '502'}:
+                    raise
+
+                self.use_mlsd = False
+
+        from ftplisting import list_parsed
+
+        for entry in list_parsed(self, path):
+            if entry.name in ('.', '..'):
+                continue
+            elif entry.type == 'dir':
+                dirnames.append(entry.name)
+            else:
+                filenames.append(entry.name)
+
+        return dirnames, filenames
 
     def rename(self, fromname, toname):
         """Rename a file."""
@@ -851,6 +1400,12 @@ class FTP:
 
     def size(self, filename):
         """Retrieve the size of a file."""
+        features = self.feature_cache.get(self._feature_key())
+
+        if features is not None and 'SIZE' not in features and 'MLST' in features:
+            size = self.mlst(filename)[1].get('size')
+            return int(size) if size is not None else None
+
         # The SIZE command is defined in RFC-3659
         resp = self.sendcmd('SIZE ' + filename)
         if resp[:3] == '213':
@@ -899,6 +1454,93 @@ class FTP:
                 sock.close()
 
 
+class _BlockSizeTuner:
+    """Adjust the block size of a transfer to the measured throughput.
+
+    Used by retrbinary() and storbinary() for blocksize='auto'. Starting with
+    the best size found for the host before (or 8192), the throughput is
+    measured over a window of blocks, from when the data connection is open
+    (see reset()). The block size is doubled as long as that increases the
+    throughput by more than 5 %, then halved as long as that does. The best
+    size is remembered in ``ftp.auto_blocksizes`` per host for later
+    transfers.
+
+    The block size is kept between ``ftp.min_blocksize`` and
+    ``ftp.max_blocksize`` and, on MicroPython, to a quarter of the free heap
+    at the start of the transfer.
+    """
+
+    # Minimum number of blocks and microseconds per measurement
+    window_blocks = 8
+    window_us = 20000
+
+    def __init__(self, ftp):
+        self.ftp = ftp
+        limit = ftp.max_blocksize
+
+        try:
+            import gc
+            limit = min(limit, gc.mem_free() // 4)
+        except (ImportError, AttributeError):
+            pass
+
+        self.min = ftp.min_blocksize
+        self.max = max(limit, self.min)
+        self.blocksize = min(max(ftp.auto_blocksizes.get(ftp.host, 8192), self.min), self.max)
+        self.initial = self.best = self.blocksize
+        self.best_rate = 0
+        self.step = 2
+        self.settled = False
+        self.reset()
+
+    def reset(self):
+        """Start a new measurement window.
+
+        Called again when the data connection is open, so the first window
+        doesn't include the time to set up the transfer.
+        """
+        self.blocks = 0
+        self.bytes = 0
+        self.start = ticks_us()
+
+    def update(self, nbytes):
+        """Count a block of nbytes and return the block size for the next one."""
+        if self.settled:
+            return self.blocksize
+
+        self.blocks += 1
+        self.bytes += nbytes
+        elapsed = ticks_diff(ticks_us(), self.start)
+
+        if self.blocks < self.window_blocks or elapsed < self.window_us:
+            return self.blocksize
+
+        rate = self.bytes / elapsed
+
+        if rate > self.best_rate * 1.05:
+            self.best = self.blocksize
+            self.best_rate = rate
+            self.ftp.auto_blocksizes[self.ftp.host] = self.best
+        elif self.step == 2 and self.best == self.initial:
+            # Growing did not help, try shrinking instead
+            self.step = 0.5
+        else:
+            self.settled = True
+
+        size = int(self.best * self.step)
+
+        if not self.settled and not self.min <= size <= self.max:
+            if self.step == 2 and self.best == self.initial:
+                self.step = 0.5
+                size = self.best // 2
+
+            self.settled = not self.min <= size <= self.max
+
+        self.blocksize = self.best if self.settled else size
+        self.reset()
+        return self.blocksize
+
+
 def _find_parentheses(s):
     left = s.find('(')
     if left < 0:
@@ -1001,3 +1643,42 @@ def parse257(resp):
         dirname = dirname + c
 
     return dirname
+
+
+def joinpath(path, name):
+    """Join a remote directory path and a name with a slash."""
+    if not path:
+        return name
+    if path[-1:] == '/':
+        return path + name
+    return path + '/' + name
+
+
+def parse_mlsx(line):
+    """Parse a line of a MLSD or MLST listing (RFC-3659).
+
+    Returns a (name, facts) tuple, where facts is a dictionary mapping fact
+    names (converted to lower case) to their values.
+    """
+    facts_found, _, name = line.rstrip(CRLF).partition(' ')
+    entry = {}
+
+    for fact in facts_found[:-1].split(";"):
+        key, _, value = fact.partition("=")
+        entry[key.lower()] = value
+
+    return (name, entry)
+
+
+def parse_mlst(resp):
+    """Parse a reply to the MLST command (RFC-3659).
+
+    Returns a (name, facts) tuple like ``parse_mlsx()``. Raises
+    ``error_proto`` if the reply contains no facts.
+    """
+    # The facts are on a line of their own, which starts with a space
+    for line in resp.split('\n')[1:]:
+        if line[:1] == ' ':
+            return parse_mlsx(line[1:])
+
+    raise error_proto(resp)
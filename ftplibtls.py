@@ -24,6 +24,13 @@ If you require server certficate validation (recommended)::
 Use the ``server_hostname`` constructor argument if the common name in the
 server's certificate differs from the host name used for connecting.
 
+For servers using implicit FTPS, where the connection is secured right after
+connecting (usually to port 990), pass ``implicit=True``::
+
+    >>> ftp = FTP_TLS('example.com', implicit=True)  # default port 990
+    >>> ftp.login('username', 'password')
+    >>> ftp.prot_p()
+
 """
 
 # Based on CPython standard library implementation adapted for MicroPython
@@ -36,6 +43,122 @@ except ImportError:
 
 
 import ftplib
+from ftplib import ticks_diff, ticks_ms, ticks_us
+
+FTPS_PORT = 990
+
+# Let the transfer methods of FTP shut down the TLS layer of data connections
+# before closing them (CPython). Otherwise, with TLS 1.3, closing an upload
+# connection with unread session tickets resets it and the server may lose
+# the end of the data.
+if hasattr(getattr(ssl, 'SSLSocket', None), 'unwrap'):
+    ftplib._SSLSocket = ssl.SSLSocket
+
+
+class TLSSessionCache:
+    """An in-memory cache of TLS sessions for FTP_TLS control connections.
+
+    Pass an instance to several FTP_TLS instances (or re-use it for later
+    connections) with the ``session_cache`` argument. When connecting to a
+    server, for which a session is cached, it is resumed with an abbreviated
+    handshake, if the server and the ``ssl`` module support it (CPython).
+
+    Args:
+      maxsize: The maximum number of cached sessions. The least recently
+               used session is discarded first.  [default: 16]
+      max_age: The maximum age of a cached session in seconds.
+               [default: 3600]
+
+    The ``stats`` attribute is a dictionary with the number of lookups,
+    hits, expired sessions, full and resumed handshakes and the total
+    duration of each kind of handshake in milliseconds.
+
+    To store sessions elsewhere, override ``get()`` and ``put()``.
+    """
+
+    def __init__(self, maxsize=16, max_age=3600):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        # key -> (session, time of put); keys in order of use
+        self._sessions = {}
+        self._order = []
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'expired': 0,
+            'full': 0,
+            'resumed': 0,
+            'full_ms': 0,
+            'resumed_ms': 0,
+        }
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, key):
+        """Return the cached session for key or None."""
+        self.stats['lookups'] += 1
+        entry = self._sessions.get(key)
+
+        if entry is None:
+            return None
+
+        session, added = entry
+
+        if ticks_diff(ticks_ms(), added) > self.max_age * 1000:
+            self.stats['expired'] += 1
+            self.remove(key)
+            return None
+
+        self.stats['hits'] += 1
+        self._order.remove(key)
+        self._order.append(key)
+        return session
+
+    def put(self, key, session):
+        """Store a session for key."""
+        if key in self._sessions:
+            self._order.remove(key)
+
+        self._sessions[key] = (session, ticks_ms())
+        self._order.append(key)
+
+        while len(self._order) > self.maxsize:
+            del self._sessions[self._order.pop(0)]
+
+    def remove(self, key):
+        """Remove the session for key, if there is one."""
+        if self._sessions.pop(key, None) is not None:
+            self._order.remove(key)
+
+    def clear(self):
+        """Remove all sessions."""
+        self._sessions = {}
+        self._order = []
+
+    def record(self, resumed, ms):
+        """Record a handshake, which took ms milliseconds."""
+        kind = 'resumed' if resumed else 'full'
+        self.stats[kind] += 1
+        self.stats[kind + '_ms'] += ms
+
+    def resumption_rate(self):
+        """Return the fraction of handshakes, which resumed a session."""
+        total = self.stats['full'] + self.stats['resumed']
+        return self.stats['resumed'] / total if total else 0
+
+    def time_saved(self):
+        """Estimate the milliseconds saved by resumed handshakes.
+
+        Based on the average duration of full and resumed handshakes.
+        """
+        stats = self.stats
+
+        if not stats['full'] or not stats['resumed']:
+            return 0
+
+        saved = stats['full_ms'] / stats['full'] - stats['resumed_ms'] / stats['resumed']
+        return max(0, saved * stats['resumed'])
 
 
 class FTP_TLS(ftplib.FTP):
@@ -47,20 +170,40 @@ class FTP_TLS(ftplib.FTP):
     Securing the data connection requires the user to explicitly ask for it by
     calling the ``prot_p()`` method.
 
+    If implicit is true, the connection is secured right after connecting,
+    before the welcome message is read, and the default port is 990.
+
+    To resume TLS sessions of earlier connections, pass a ``TLSSessionCache``
+    with the ``session_cache`` argument.
+
+    Data connections resume the TLS session of the control connection, as
+    many servers require. Set the ``reuse_session`` attribute to False for
+    servers, which don't support that.
+
     See the module docstring for a usage example.
 
     """
 
+    # Whether to resume the control connection's TLS session on data
+    # connections
+    reuse_session = True
+
     def __init__(self, host=None, port=None, user=None, passwd=None, acct=None,
                  timeout=ftplib._GLOBAL_DEFAULT_TIMEOUT, source_address=None,
-                 ssl_context=None, server_hostname=None):
+                 ssl_context=None, server_hostname=None, session_cache=None,
+                 implicit=False):
         self.ssl_context = ssl_context
         self.server_hostname = server_hostname
+        self.session_cache = session_cache
+        self.implicit = implicit
+        if implicit:
+            self.port = FTPS_PORT
         self._wrapped = False
         self._prot_p = False
+        self._sscn = False
         super().__init__(host, port, user, passwd, acct, timeout, source_address)
 
-    def _wrap_socket(self, sock):
+    def _wrap_socket(self, sock, session=None):
         if self.ssl_context is None:
             if hasattr(ssl, 'create_default_context'):
                 self.ssl_context = ssl.create_default_context()
@@ -68,12 +211,60 @@ class FTP_TLS(ftplib.FTP):
                 self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
                 self.ssl_context.verify_mode = ssl.CERT_OPTIONAL
 
-        return self.ssl_context.wrap_socket(sock, server_hostname=self.server_hostname or self.host)
+        server_hostname = self.server_hostname or self.host
+
+        if session is not None:
+            # Resume the given TLS session (not supported by MicroPython)
+            return self.ssl_context.wrap_socket(sock, server_hostname=server_hostname,
+                                                session=session)
+
+        return self.ssl_context.wrap_socket(sock, server_hostname=server_hostname)
+
+    def _tls_session(self):
+        """Return the TLS session of the control connection or None."""
+        return getattr(getattr(self.sock, '_sock', self.sock), 'session', None)
+
+    def _data_session(self):
+        """Return the TLS session to resume on a data connection or None."""
+        return self._tls_session() if self.reuse_session else None
+
+    def connect(self, host=None, port=None, timeout=None, source_address=None):
+        if not self.implicit:
+            return super().connect(host, port, timeout, source_address)
+
+        # Like FTP.connect(), but secure the connection before reading the
+        # welcome message
+        if host:
+            self.host = host
+        if port:
+            self.port = port
+        if timeout is None:
+            timeout = self.timeout
+        if not source_address:
+            source_address = self.source_address
+
+        self.sock = self._create_connection((self.host, self.port), timeout,
+                                            source_address)
+        self.af = self.sock.family
+        self._secure_control()
+        self.welcome = self.getresp()
+        return self.welcome
 
     def login(self, user=None, passwd=None, acct=None, secure=True):
         if secure and not self._wrapped:
             self.auth()
-        return super().login(user, passwd, acct)
+        resp = super().login(user, passwd, acct)
+
+        # With TLS 1.3, the session is only available after reading from the
+        # connection, so cache it after the login replies
+        session = self._tls_session()
+        if self.session_cache is not None and session is not None:
+            self.session_cache.put(self._session_key(), session)
+
+        return resp
+
+    def _session_key(self):
+        return '%s:%s' % (self.server_hostname or self.host, self.port)
 
     def auth(self):
         """Set up secure control connection by using TLS/SSL."""
@@ -81,12 +272,29 @@ class FTP_TLS(ftplib.FTP):
             raise ValueError("Already using TLS")
 
         resp = self.voidcmd('AUTH TLS')
+        self._secure_control()
+        return resp
+
+    def _secure_control(self):
         sock = getattr(self.sock, '_sock', None)
 
         if sock is None:
             sock = self.sock
 
-        wrapped = self._wrap_socket(sock)
+        cache = self.session_cache
+
+        if cache is None:
+            wrapped = self._wrap_socket(sock)
+        else:
+            session = cache.get(self._session_key())
+            start = ticks_us()
+            wrapped = self._wrap_socket(sock, session)
+            resumed = getattr(wrapped, 'session_reused', False)
+            cache.record(resumed, ticks_diff(ticks_us(), start) / 1000)
+
+            if session is not None and not resumed:
+                # Rejected by the server, e.g. expired
+                cache.remove(self._session_key())
 
         if hasattr(self.sock, '_sock'):
             self.sock._sock = wrapped
@@ -96,7 +304,6 @@ class FTP_TLS(ftplib.FTP):
              self.file = self.sock.makefile('rb')
 
         self._wrapped = True
-        return resp
 
     def ccc(self):
         """Switch back to a clear-text control connection."""
@@ -130,16 +337,55 @@ class FTP_TLS(ftplib.FTP):
         self._prot_p = False
         return resp
 
+    def sscn(self, on=True):
+        """Set whether the server acts as TLS client on data connections.
+
+        Sends the SSCN command. This is needed for direct server-to-server
+        transfers (see ``ftpcp``) with protected data connections, where one
+        of the servers must act as TLS client. It is switched off again
+        before the next transfer to this client.
+        """
+        resp = self.voidcmd('SSCN ON' if on else 'SSCN OFF')
+        self._sscn = on
+        return resp
+
     # --- Overridden FTP methods
 
+    def abort(self):
+        """Abort a file transfer.
+
+        Unlike FTP.abort(), send the ABOR command in-band, since TLS sockets
+        don't support out-of-band data.
+        """
+        line = b'ABOR' + ftplib.B_CRLF
+        if self.debugging > 1:
+            print('*put*', self.sanitize(line))
+
+        self.sock.sendall(line)
+        resp = self.getmultiline()
+
+        if resp[:3] not in {'426', '225', '226'}:
+            raise ftplib.error_proto("Unexpected ABOR response: %r" % resp)
+
+        return resp
+
     def ntransfercmd(self, cmd, rest=None):
+        if self._sscn:
+            self.sscn(False)
+
         conn, size = super().ntransfercmd(cmd, rest)
         if self._prot_p:
-            sock = self._wrap_socket(getattr(conn, '_sock', conn))
+            # Many servers require data connections to reuse the TLS session
+            # of the control connection; it also saves a full handshake
+            sock = self._wrap_socket(getattr(conn, '_sock', conn), self._data_session())
 
             if hasattr(conn, '_sock'):
                 conn._sock = sock
             else:
                 conn = sock
 
+            if self.stats is not None:
+                self.stats.mark('tls')
+                self.stats.set('tls_resumed', getattr(sock, 'session_reused', None))
+
         return conn, size
@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+"""Compact storage of large directory listings.
+
+A ``ListingTable`` stores directory entries in columns instead of one tuple
+and dictionary per entry: sizes and modification times in arrays, the
+(few distinct) values of the "type" and "perm" facts as indexes into a list
+of unique values and all names in a single byte buffer.
+
+Example::
+
+    >>> from ftplisting import listing_table
+    >>> table = listing_table(ftp, 'logs')
+    >>> len(table)
+    100000
+    >>> table.find('2024-01-01.log')
+    ListingEntry('2024-01-01.log', 'file', 52134, 20240102000000, 'adfrw')
+    >>> for entry in table.sorted_by('size', reverse=True):
+    ...     print(entry.name, entry.size)
+
+"""
+
+import time
+from array import array
+
+from ftpbatch import pipeline
+from ftplib import error_perm, parse_mlst
+
+try:
+    array('q')
+    _INT = 'q'
+except ValueError:
+    # No 64-bit integer arrays; doubles hold integers up to 2**53 exactly
+    _INT = 'd'
+
+# Value of size and modify for unknown values
+UNKNOWN = -1
+
+_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+_UNIX_TYPES = {'d': 'dir', '-': 'file', 'l': 'OS.unix=symlink'}
+
+
+class ListingEntry:
+    """A single directory entry.
+
+    Attributes:
+      name: The file name.
+      type: The "type" fact, e.g. 'file' or 'dir' (or None if unknown).
+      size: The size in bytes (or -1 if unknown).
+      modify: The modification time as an integer of the form
+              YYYYMMDDHHMMSS in UTC (or -1 if unknown).
+      perm: The "perm" fact (or None if unknown).
+    """
+
+    __slots__ = ('name', 'type', 'size', 'modify', 'perm')
+
+    def __init__(self, name, type=None, size=UNKNOWN, modify=UNKNOWN, perm=None):
+        self.name = name
+        self.type = type
+        self.size = size
+        self.modify = modify
+        self.perm = perm
+
+    def __repr__(self):
+        return "ListingEntry(%r, %r, %r, %r, %r)" % (self.name, self.type, self.size,
+                                                     self.modify, self.perm)
+
+
+# Internal: create a ListingEntry from a name and facts as returned by mlsd()
+def _facts_entry(name, facts):
+    size = facts.get('size', facts.get('sizd'))
+    return ListingEntry(name, facts.get('type'), UNKNOWN if size is None else int(size),
+                        parse_modify(facts.get('modify')), facts.get('perm'))
+
+
+def parse_modify(value):
+    """Convert a "modify" fact or MDTM time value to an integer.
+
+    Fractions of seconds are discarded. Returns -1 for missing or invalid values.
+    """
+    try:
+        return int(value[:14])
+    except (TypeError, ValueError):
+        return UNKNOWN
+
+
+def _int(s):
+    try:
+        return int(s)
+    except ValueError:
+        return UNKNOWN
+
+
+def _parse_unix(line, today):
+    fields = line.split(None, 8)
+
+    if len(fields) < 8:
+        return None
+
+    if fields[5][:3].lower() not in _MONTHS and fields[4][:3].lower() in _MONTHS:
+        # No group column
+        fields = line.split(None, 7)
+        fields.insert(3, '')
+
+    if len(fields) < 9:
+        return None
+
+    name = fields[8]
+    month = _MONTHS.get(fields[5][:3].lower())
+    day = _int(fields[6])
+    hhmm = fields[7]
+
+    if month is None or day < 0:
+        return None
+
+    if ':' in hhmm:
+        # Recent file, the year is omitted; it lies in the last six months
+        year = today[0]
+        if (month, day) > (today[1], today[2] + 1):
+            year -= 1
+        hour, _, minute = hhmm.partition(':')
+        modify = (((year * 100 + month) * 100 + day) * 10000 +
+                  _int(hour) * 100 + _int(minute)) * 100
+    else:
+        modify = ((_int(hhmm) * 100 + month) * 100 + day) * 1000000
+
+    type = _UNIX_TYPES.get(line[0], 'OS.unix=' + line[0])
+
+    if line[0] == 'l':
+        name = name.split(' -> ', 1)[0]
+
+    return ListingEntry(name, type, _int(fields[4]), modify)
+
+
+def _parse_dos(line):
+    fields = line.split(None, 3)
+
+    if len(fields) < 4:
+        return None
+
+    date, hhmm, size, name = fields
+    date = date.split('-', 2) if date.count('-') == 2 else date.split('/', 2)
+
+    if len(date[0]) == 4:
+        # YYYY-MM-DD, e.g. IIS with four-digit years
+        year, month, day = (int(x) for x in date)
+    else:
+        month, day, year = (int(x) for x in date)
+
+        if year < 100:
+            year += 2000 if year < 70 else 1900
+
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+
+    hour, _, minute = hhmm.partition(':')
+    hour = _int(hour)
+
+    if minute[-2:].upper() == 'PM':
+        if hour < 12:
+            hour += 12
+    elif minute[-2:].upper() == 'AM' and hour == 12:
+        hour = 0
+
+    modify = (((year * 100 + month) * 100 + day) * 10000 +
+              hour * 100 + _int(minute[:2])) * 100
+
+    if size.upper() == '<DIR>':
+        return ListingEntry(name, 'dir', UNKNOWN, modify)
+
+    return ListingEntry(name, 'file', _int(size), modify)
+
+
+def parse_list_line(line, today=None):
+    """Parse a line of LIST output and return a ListingEntry.
+
+    Lines in the format of Unix ``ls -l`` and of DOS / Microsoft IIS servers
+    are supported. Returns None for lines, which can't be parsed, e.g. the
+    "total" line at the start of ``ls -l`` output.
+
+    The entry's modify attribute is the time as given by the server, usually
+    in its local time zone. ``ls -l`` omits the year for files modified in the
+    last six months. It is inferred from ``today``, a (year, month, day)
+    tuple, which defaults to the current date.
+    """
+    c = line[:1]
+
+    try:
+        if c in _UNIX_TYPES or line[1:2] in ('r', '-'):
+            return _parse_unix(line, today or time.localtime()[:3])
+        if c.isdigit():
+            return _parse_dos(line)
+    except (IndexError, ValueError):
+        pass
+
+    return None
+
+
+class ListingTable:
+    """Columnar storage for directory entries.
+
+    Indexing and iterating return ``ListingEntry`` instances, which are
+    created on access. Look up entries by name with ``find()`` or ``index()``
+    and sort them with ``sorted_by()``.
+    """
+
+    def __init__(self):
+        self._sizes = array(_INT)
+        self._modify = array(_INT)
+        self._type_ids = array('B')
+        self._perm_ids = array('H')
+        self._types = [None]
+        self._perms = [None]
+        # All names concatenated and the offset of each name
+        self._names = bytearray()
+        self._offsets = array('L')
+        self._hashtable = None
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+
+        return ListingEntry(self.name(i), self._types[self._type_ids[i]], int(self._sizes[i]),
+                            int(self._modify[i]), self._perms[self._perm_ids[i]])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    # Internal: return the index of value in the list of unique values
+    def _intern(self, values, value):
+        try:
+            return values.index(value)
+        except ValueError:
+            values.append(value)
+            return len(values) - 1
+
+    def add(self, name, type=None, size=UNKNOWN, modify=UNKNOWN, perm=None):
+        """Add an entry."""
+        self._offsets.append(len(self._names))
+        self._names.extend(name.encode())
+        self._sizes.append(size)
+        self._modify.append(modify)
+        self._type_ids.append(self._intern(self._types, type))
+        self._perm_ids.append(self._intern(self._perms, perm))
+        self._hashtable = None
+
+    def append(self, entry):
+        """Add an entry as returned by ``FTP.mlsd()`` or a ListingEntry."""
+        if isinstance(entry, ListingEntry):
+            self.add(entry.name, entry.type, entry.size, entry.modify, entry.perm)
+        else:
+            entry = _facts_entry(*entry)
+            self.add(entry.name, entry.type, entry.size, entry.modify, entry.perm)
+
+    def name(self, i):
+        """Return the name of the entry at index i."""
+        return self._name_bytes(i).decode()
+
+    def _name_bytes(self, i):
+        offsets = self._offsets
+        end = offsets[i + 1] if i + 1 < len(offsets) else len(self._names)
+        return bytes(self._names[offsets[i]:end])
+
+    def index(self, name):
+        """Return the index of the entry with the given name or -1."""
+        table = self._hashtable
+
+        if table is None:
+            table = self._build_hashtable()
+
+        key = name.encode()
+        mask = len(table) - 1
+        slot = hash(key) & mask
+
+        # Open addressing with linear probing; a slot stores index + 1
+        while table[slot]:
+            i = table[slot] - 1
+
+            if self._name_bytes(i) == key:
+                return i
+
+            slot = (slot + 1) & mask
+
+        return -1
+
+    def find(self, name):
+        """Return the entry with the given name or None."""
+        i = self.index(name)
+        return None if i < 0 else self[i]
+
+    def sorted_by(self, field='name', reverse=False):
+        """Iterate over the entries sorted by 'name', 'size' or 'modify'."""
+        if field == 'name':
+            key = self._name_bytes
+        elif field in ('size', 'modify'):
+            column = self._sizes if field == 'size' else self._modify
+            key = lambda i: column[i]
+        else:
+            raise ValueError("Can't sort by '%s'" % field)
+
+        for i in sorted(range(len(self)), key=key, reverse=reverse):
+            yield self[i]
+
+    def _build_hashtable(self):
+        n = len(self)
+        size = 8
+
+        while size < 2 * n:
+            size *= 2
+
+        table = array('L', [0] * size)
+        mask = size - 1
+
+        for i in range(n):
+            slot = hash(self._name_bytes(i)) & mask
+
+            while table[slot]:
+                slot = (slot + 1) & mask
+
+            table[slot] = i + 1
+
+        self._hashtable = table
+        return table
+
+
+def list_parsed(ftp, path=""):
+    """List a directory with the LIST command and parse the output.
+
+    For servers which don't support the MLSD command. Return a generator
+    object yielding a ListingEntry for every entry in the directory (see
+    ``parse_list_line()`` for supported formats). If the generator is closed
+    before it is exhausted, the transfer is aborted.
+
+    If ``ftp.use_stat`` is true, the listing is requested with the STAT
+    command instead (see ``FTP.dir()``).
+    """
+    today = time.localtime()[:3]
+
+    if ftp.use_stat:
+        lines = ftp._statlines(path)
+
+        if lines is not None:
+            for line in lines:
+                entry = parse_list_line(line, today)
+
+                if entry is not None:
+                    yield entry
+            return
+
+    lines = ftp._iterlines('LIST %s' % path if path else 'LIST')
+
+    try:
+        for line in lines:
+            entry = parse_list_line(line, today)
+
+            if entry is not None:
+                yield entry
+    finally:
+        lines.close()
+
+    ftp._endtransfer()
+
+
+def listing_table(ftp, path="", facts=[], use_list=False):
+    """Return a ListingTable with the entries of a directory.
+
+    The listing is retrieved with ``ftp.mlsd()``, or with
+    ``list_parsed()`` if use_list is true. See there for the meaning of the
+    arguments.
+    """
+    table = ListingTable()
+
+    for entry in list_parsed(ftp, path) if use_list else ftp.mlsd(path, facts):
+        table.append(entry)
+
+    return table
+
+
+def stat_many(ftp, paths, window=16, min_listing=2, facts=[]):
+    """Return the type, size and modification time of many paths.
+
+    Instead of sending a SIZE and an MDTM command for each path, the paths
+    are grouped by their parent directory, which is listed only once with
+    MLSD or, if the server doesn't support it, with LIST (see
+    ``list_parsed()``). Directories with fewer than min_listing of the paths
+    aren't listed. For their paths, and those in directories which can't
+    be listed, the MLST command or, if the server doesn't support it (see
+    ``FTP.features()``), the SIZE and MDTM commands are sent, up to window
+    commands at a time before their replies are read.
+
+    MLSD and MLST return the facts selected for the session. Pass a list of
+    facts, e.g. ['type', 'size', 'modify', 'perm'], to select them first
+    with OPTS MLST, as ``FTP.mlsd()`` does, if the server supports MLSD. The
+    selection is kept for the session.
+
+    Returns a dictionary mapping each path to a ListingEntry with the path as
+    name, or to None, if it doesn't exist. Entries from LIST have the
+    modification time in the server's local time zone (see
+    ``parse_list_line()``). Entries from SIZE and MDTM have the type 'file',
+    or None, if the size is unknown, and no permissions.
+    """
+    groups = {}
+    single = []
+    result = {}
+
+    if facts and ftp._mlsd_supported():
+        ftp.sendcmd('OPTS MLST ' + ';'.join(facts) + ';')
+
+    for path in paths:
+        parent, name = _split(path)
+        groups.setdefault(parent, {})[name] = path
+
+    for parent, names in groups.items():
+        if len(names) < min_listing:
+            single.extend(names.values())
+            continue
+
+        try:
+            entries = _list_entries(ftp, parent, names)
+        except error_perm:
+            # Not allowed to list the directory or it doesn't exist
+            single.extend(names.values())
+            continue
+
+        for name, path in names.items():
+            entry = entries.get(name)
+
+            if entry is not None:
+                entry.name = path
+
+            result[path] = entry
+
+    if single:
+        _stat_pipelined(ftp, single, result, window)
+
+    return result
+
+
+# Internal: split a path into the parent directory and the name
+def _split(path):
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    i = path.rfind('/')
+
+    if i < 0:
+        return '', path
+
+    return path[:i] or '/', path[i + 1:]
+
+
+# Internal: return a dict of the entries of a directory with the given names
+def _list_entries(ftp, path, names):
+    entries = {}
+
+    if ftp._mlsd_supported():
+        try:
+            for name, facts in ftp.mlsd(path):
+                if name in names:
+                    entries[name] = _facts_entry(name, facts)
+
+            ftp.use_mlsd = True
+            return entries
+        except error_perm as exc:
+            # Command not recognized / implemented?
+            if ftp.use_mlsd or exc.args[0][:3] not in {'500', '502'}:
+                raise
+
+            ftp.use_mlsd = False
+
+    for entry in list_parsed(ftp, path):
+        if entry.name in names:
+            entries[entry.name] = entry
+
+    return entries
+
+
+# Internal: get the entries of the paths with MLST or, if the server doesn't
+# support it, SIZE and MDTM commands, and add them to result
+def _stat_pipelined(ftp, paths, result, window):
+    features = ftp.feature_cache.get(ftp._feature_key())
+
+    if features is not None and 'MLST' in features:
+        replies = pipeline(ftp, ['MLST ' + path for path in paths], window)
+
+        for path, resp in zip(paths, replies):
+            if isinstance(resp, Exception):
+                result[path] = None
+            else:
+                result[path] = _facts_entry(path, parse_mlst(resp)[1])
+
+        return
+
+    # SIZE is not allowed in ASCII mode by some servers
+    cmds = ['TYPE I']
+
+    for path in paths:
+        cmds.append('SIZE ' + path)
+        cmds.append('MDTM ' + path)
+
+    replies = [None if isinstance(resp, Exception) or resp[:3] != '213' else resp
+               for resp in pipeline(ftp, cmds, window)[1:]]
+
+    for i, path in enumerate(paths):
+        size = replies[2 * i]
+        modify = replies[2 * i + 1]
+
+        if size is None and modify is None:
+            result[path] = None
+        else:
+            result[path] = ListingEntry(path, None if size is None else 'file',
+                                        UNKNOWN if size is None else _int(size[4:].strip()),
+                                        UNKNOWN if modify is None else parse_modify(modify[4:]))
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""A pool of logged-in FTP sessions, which are re-used across jobs.
+
+Example::
+
+    >>> from ftppool import FTPPool
+    >>> pool = FTPPool(max_per_host=2)
+    >>> with pool.connection('example.com', user='username', passwd='secret') as ftp:
+    ...     ftp.storbinary('STOR data.bin', fp)
+    ...
+    >>> pool.stats
+    {'hits': 0, 'misses': 1, 'evictions': 0, 'checkouts': 1, 'checkout_ms': 154, 'max_checkout_ms': 154}
+    >>> pool.close()
+
+Use the ``ftp_class`` argument to pool ``FTP_TLS`` sessions and the ``setup``
+argument to call ``prot_p()`` on each new session::
+
+    >>> from ftplibtls import FTP_TLS
+    >>> pool = FTPPool(FTP_TLS, setup=FTP_TLS.prot_p, server_hostname='example.com')
+
+"""
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+import ftplib
+from ftplib import sleep_ms, ticks_diff, ticks_ms
+
+
+class _DummyLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class _PooledConnection:
+    def __init__(self, pool, args, kwargs):
+        self.pool = pool
+        self.args = args
+        self.kwargs = kwargs
+        self.ftp = None
+
+    def __enter__(self):
+        self.ftp = self.pool.checkout(*self.args, **self.kwargs)
+        return self.ftp
+
+    def __exit__(self, exc_type, exc, tb):
+        # The state of the connection is unknown after a network error
+        self.pool.checkin(self.ftp, discard=exc_type is not None and
+                          not issubclass(exc_type, ftplib.Error))
+        self.ftp = None
+
+
+class FTPPool:
+    """A pool of logged-in FTP sessions.
+
+    Sessions are created on demand by ``checkout()`` and put back into the pool
+    by ``checkin()``, or use ``connection()`` as a context manager for both.
+
+    Before an idle session is handed out again, a NOOP command checks that it
+    is still alive and its working directory and transfer type are reset to
+    what they were after logging in. These commands are sent together, so this
+    costs only one round trip. Sessions which are idle for longer than
+    ``max_idle`` seconds or fail the check are closed.
+
+    Args:
+      ftp_class: The class used to create sessions.  [default: ftplib.FTP]
+      max_per_host: The maximum number of sessions to each host, idle or in
+                    use.  [default: 4]
+      max_idle: Maximum time in seconds a session may stay idle in the pool.
+                [default: 60]
+      setup: An optional single parameter callable, which is called with
+             each new session after logging in.  [default: None]
+      kwargs: Further keyword arguments passed to ftp_class on creation of
+              a session (e.g. timeout or ssl_context).
+
+    The ``stats`` attribute is a dictionary with the number of pool hits,
+    misses, evictions and checkouts, and the total and maximum time in
+    milliseconds checkouts took.
+    """
+
+    def __init__(self, ftp_class=ftplib.FTP, max_per_host=4, max_idle=60, setup=None,
+                 **kwargs):
+        self.ftp_class = ftp_class
+        self.max_per_host = max_per_host
+        self.max_idle = max_idle
+        self.setup = setup
+        self.kwargs = kwargs
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'checkouts': 0,
+            'checkout_ms': 0,
+            'max_checkout_ms': 0,
+        }
+        self._lock = _thread.allocate_lock() if _thread else _DummyLock()
+        # (host, port, user) -> list of (ftp, time of checkin)
+        self._idle = {}
+        # host -> number of sessions, idle or in use
+        self._count = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connection(self, *args, **kwargs):
+        """Return a context manager for a session from the pool.
+
+        All arguments are passed to ``checkout()``. On exit, the session is
+        checked in again, unless an exception other than an FTP error
+        response occurred.
+        """
+        return _PooledConnection(self, args, kwargs)
+
+    def checkout(self, host, port=None, user='', passwd='', acct='', wait=None):
+        """Get a logged-in session from the pool or create a new one.
+
+        If the maximum number of sessions to the host has been reached, wait
+        until another session is checked in, for at most ``wait`` seconds
+        (wait forever if None). Raises ftplib.Error if none is available
+        after that.
+        """
+        start = ticks_ms()
+        key = (host, port or ftplib.FTP_PORT, user)
+
+        while True:
+            ftp = None
+            expired = []
+            new = False
+
+            with self._lock:
+                idle = self._idle.get(key)
+
+                while idle:
+                    candidate, last_used = idle.pop()
+
+                    if ticks_diff(start, last_used) > self.max_idle * 1000:
+                        expired.append(candidate)
+                    else:
+                        ftp = candidate
+                        break
+
+                if ftp is None and self._count.get(host, 0) < self.max_per_host:
+                    # Reserve a slot for a new session
+                    self._count[host] = self._count.get(host, 0) + 1
+                    new = True
+
+            for candidate in expired:
+                self._evict(candidate)
+
+            if ftp is not None:
+                if self._check(ftp):
+                    self._update_stats('hits', start)
+                    return ftp
+
+                self._evict(ftp)
+            elif new:
+                try:
+                    ftp = self._create(host, port, user, passwd, acct)
+                except:
+                    self._release(host)
+                    raise
+
+                self._update_stats('misses', start)
+                return ftp
+            elif wait is not None and ticks_diff(ticks_ms(), start) >= wait * 1000:
+                raise ftplib.Error("No connection to %s available" % host)
+            else:
+                sleep_ms(10)
+
+    def checkin(self, ftp, discard=False):
+        """Put a session checked out from the pool back into it.
+
+        If discard is true, close the session instead.
+        """
+        if discard:
+            self._evict(ftp)
+        else:
+            with self._lock:
+                self._idle.setdefault(ftp._pool_key, []).append((ftp, ticks_ms()))
+
+    def walk(self, top, host, port=None, user='', passwd='', acct='', workers=None,
+             maxqueue=16, onerror=None):
+        """Walk a remote directory tree, listing directories in parallel.
+
+        Like ``FTP.walk()``, but directories are listed by several worker
+        threads, each using its own session from the pool. Return a generator
+        object yielding a (dirpath, dirnames, filenames) tuple for each
+        directory, in the order the listings complete. Removing names from
+        dirnames has no effect.
+
+        Args:
+          top: The directory to start at.
+          host, port, user, passwd, acct: Passed to ``checkout()``.
+          workers: The number of worker threads. Defaults to and is limited
+                   by max_per_host.
+          maxqueue: The maximum number of listings, which are waiting to be
+                    consumed, before workers pause.  [default: 16]
+          onerror: An optional single parameter callable, which is called
+                   with the exception, if listing a directory fails with an
+                   error reply.  [default: None]
+
+        Without thread support, this is the same as ``FTP.walk()`` on a
+        single session from the pool.
+        """
+        if _thread is None:
+            with self.connection(host, port, user, passwd, acct) as ftp:
+                for result in ftp.walk(top, onerror):
+                    yield result
+            return
+
+        # Directories to be listed, listings and errors to be consumed
+        state = {'pending': [top], 'active': 0, 'workers': 0, 'stop': False, 'exc': None}
+        results = []
+        lock = _thread.allocate_lock()
+        login = (host, port, user, passwd, acct)
+
+        for _ in range(min(workers or self.max_per_host, self.max_per_host)):
+            state['workers'] += 1
+            _thread.start_new_thread(self._walk_worker, (login, state, results, lock,
+                                                         maxqueue))
+
+        try:
+            while True:
+                with lock:
+                    result = results.pop(0) if results else None
+                    finished = state['workers'] == 0 and not results
+
+                if result is None:
+                    if finished:
+                        break
+                    sleep_ms(5)
+                elif isinstance(result, ftplib.Error):
+                    if onerror is not None:
+                        onerror(result)
+                else:
+                    yield result
+
+            # All workers failed before listing all directories
+            if state['pending'] and state['exc'] is not None:
+                raise state['exc']
+        finally:
+            state['stop'] = True
+
+            while state['workers']:
+                sleep_ms(5)
+
+    def _walk_worker(self, login, state, results, lock, maxqueue):
+        pending = state['pending']
+        error = None
+
+        try:
+            with self.connection(*login) as ftp:
+                while not state['stop']:
+                    path = None
+
+                    with lock:
+                        if pending and len(results) < maxqueue:
+                            path = pending.pop()
+                            state['active'] += 1
+                        elif not pending and not state['active']:
+                            break
+
+                    if path is None:
+                        sleep_ms(5)
+                        continue
+
+                    try:
+                        dirnames, filenames = ftp.listdir(path)
+                    except ftplib.Error as exc:
+                        with lock:
+                            results.append(exc)
+                            state['active'] -= 1
+                        continue
+                    except:
+                        # Leave directory to the remaining workers
+                        with lock:
+                            pending.append(path)
+                            state['active'] -= 1
+                        raise
+
+                    with lock:
+                        results.append((path, dirnames, filenames))
+                        for name in dirnames:
+                            pending.append(ftplib.joinpath(path, name))
+                        state['active'] -= 1
+        except Exception as exc:
+            # The remaining workers list the directories left; if there are
+            # none, walk() raises the error
+            error = exc
+        finally:
+            with lock:
+                if error is not None:
+                    state['exc'] = error
+                state['workers'] -= 1
+
+    def close(self):
+        """Close all idle sessions."""
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+
+        for sessions in idle.values():
+            for ftp, _ in sessions:
+                self._evict(ftp)
+
+    # Internal: create and log in a new session
+    def _create(self, host, port, user, passwd, acct):
+        ftp = self.ftp_class(**self.kwargs)
+
+        try:
+            ftp.connect(host, port)
+            ftp.login(user, passwd, acct)
+
+            if self.setup:
+                self.setup(ftp)
+
+            ftp._pool_key = (host, port or ftplib.FTP_PORT, user)
+            ftp._pool_home = ftp.pwd()
+        except:
+            ftp.close()
+            raise
+
+        return ftp
+
+    # Internal: check whether an idle session is still alive and reset it
+    def _check(self, ftp):
+        try:
+            # Send all commands at once and then read the replies
+            ftp.putcmd('NOOP')
+            if ftp._pool_home:
+                ftp.putcmd('CWD ' + ftp._pool_home)
+            ftp.putcmd('TYPE I')
+
+            ftp.voidresp()
+            if ftp._pool_home:
+                ftp.voidresp()
+            ftp.voidresp()
+        except (OSError, EOFError, ftplib.Error):
+            return False
+
+        return True
+
+    # Internal: close a session and release its slot
+    def _evict(self, ftp):
+        try:
+            ftp.quit()
+        except (OSError, EOFError, ftplib.Error):
+            ftp.close()
+
+        self._release(ftp._pool_key[0])
+
+        with self._lock:
+            self.stats['evictions'] += 1
+
+    def _release(self, host):
+        with self._lock:
+            self._count[host] -= 1
+
+    def _update_stats(self, result, start):
+        elapsed = ticks_diff(ticks_ms(), start)
+
+        with self._lock:
+            stats = self.stats
+            stats[result] += 1
+            stats['checkouts'] += 1
+            stats['checkout_ms'] += elapsed
+
+            if elapsed > stats['max_checkout_ms']:
+                stats['max_checkout_ms'] = elapsed
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""Timing and throughput statistics for FTP data transfers.
+
+Assign a ``TransferStats`` instance to the ``stats`` attribute of an ``FTP``
+or ``FTP_TLS`` instance to record, for every transfer, when each phase of it
+ended and how many bytes were transferred. If ``stats`` is None (the default),
+nothing is recorded.
+
+Example::
+
+    >>> from ftpstats import TransferStats
+    >>> ftp.stats = TransferStats()
+    >>> ftp.retrbinary('RETR data.bin', fp.write)
+    '226 Transfer complete.'
+    >>> t = ftp.stats.transfers[-1]
+    >>> t.phases()
+    {'pasv': 1.2, 'connect': 0.4, 'reply': 1.1, 'data': 152.3, 'done': 0.9}
+    >>> t.throughput()
+    1315162.0
+    >>> print(t.to_json())
+
+The phases are:
+
+* pasv: the PASV or EPSV command (passive mode) or
+* port: opening a listening socket and the PORT or EPRT command (active mode)
+* connect: connecting the data connection (passive mode)
+* reply: sending the transfer command and waiting for the 1xx reply
+* accept: accepting the data connection (active mode)
+* tls: the TLS handshake on the data connection (``FTP_TLS`` only)
+* data: transferring the payload and closing the data connection
+* done: waiting for the final reply
+
+"""
+
+try:
+    import json
+except ImportError:
+    import ujson as json
+
+from ftplib import ticks_diff, ticks_ms, ticks_us
+
+
+class Transfer:
+    """Statistics of a single transfer.
+
+    Attributes:
+      cmd: The transfer command.
+      marks: A list of (phase, microseconds) tuples with the time the phase
+             ended, relative to the start of the transfer.
+      bytes: The number of payload bytes transferred.
+      samples: A list of (microseconds, bytes) tuples, recorded at most every
+               ``interval`` milliseconds during the payload transfer.
+      resp: The final response of the server.
+      info: A dictionary with further information about the transfer, e.g.
+            'tls_resumed', whether the TLS session of the control connection
+            was resumed on the data connection (None if unknown).
+    """
+
+    __slots__ = ('cmd', 'marks', 'bytes', 'samples', 'resp', 'info', '_us', '_ms', '_elapsed')
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.marks = []
+        self.bytes = 0
+        self.samples = []
+        self.resp = None
+        self.info = {}
+        self._us = ticks_us()
+        self._ms = ticks_ms()
+        self._elapsed = 0
+
+    def elapsed(self):
+        """Return the microseconds since the start of the transfer.
+
+        On MicroPython, the difference of two ticks_us() values is only valid
+        for up to about nine minutes, so the time since the last call is
+        added up, measured with ticks_us() if it is less than a minute and
+        with ticks_ms() otherwise.
+        """
+        us = ticks_us()
+        ms = ticks_ms()
+        diff = ticks_diff(ms, self._ms)
+
+        if diff < 60000:
+            self._elapsed += ticks_diff(us, self._us)
+        else:
+            self._elapsed += diff * 1000
+
+        self._us = us
+        self._ms = ms
+        return self._elapsed
+
+    def phases(self):
+        """Return a dictionary with the duration of each phase in milliseconds."""
+        result = {}
+        last = 0
+
+        for phase, t in self.marks:
+            result[phase] = (t - last) / 1000
+            last = t
+
+        return result
+
+    def duration(self):
+        """Return the total duration in milliseconds."""
+        return self.marks[-1][1] / 1000 if self.marks else 0
+
+    def throughput(self):
+        """Return the average throughput of the payload transfer in bytes/s."""
+        phases = self.phases()
+        ms = phases.get('data', 0)
+        return self.bytes * 1000 / ms if ms else 0
+
+    def rates(self):
+        """Return a list of (milliseconds, bytes/s) tuples.
+
+        The throughput between two consecutive samples, i.e. the
+        instantaneous throughput during the payload transfer.
+        """
+        result = []
+
+        for i in range(1, len(self.samples)):
+            t0, n0 = self.samples[i - 1]
+            t1, n1 = self.samples[i]
+
+            if t1 > t0:
+                result.append((t1 / 1000, (n1 - n0) * 1000000 / (t1 - t0)))
+
+        return result
+
+    def to_dict(self):
+        """Return the statistics as a dictionary."""
+        return {
+            'cmd': self.cmd,
+            'resp': self.resp,
+            'bytes': self.bytes,
+            'duration_ms': self.duration(),
+            'phases_ms': self.phases(),
+            'throughput': self.throughput(),
+            'rates': self.rates(),
+            'info': self.info,
+        }
+
+    def to_json(self):
+        """Return the statistics as a JSON string."""
+        return json.dumps(self.to_dict())
+
+
+class TransferStats:
+    """Collects statistics of the transfers of an FTP instance.
+
+    Args:
+      maxlen: The maximum number of finished transfers to keep. The oldest
+              ones are discarded.  [default: 100]
+      interval: The minimum time in milliseconds between two samples of the
+                number of bytes transferred.  [default: 100]
+
+    Finished transfers are stored as ``Transfer`` instances in the
+    ``transfers`` attribute.
+    """
+
+    def __init__(self, maxlen=100, interval=100):
+        self.maxlen = maxlen
+        self.interval = interval * 1000
+        self.transfers = []
+        self.current = None
+        self._next_sample = 0
+
+    def begin(self, cmd):
+        """Start recording a new transfer."""
+        self.current = Transfer(cmd)
+        self._next_sample = 0
+
+    def mark(self, phase):
+        """Record the end of a phase of the current transfer."""
+        transfer = self.current
+
+        if transfer is not None:
+            t = transfer.elapsed()
+            transfer.marks.append((phase, t))
+
+            if phase == 'data':
+                transfer.samples.append((t, transfer.bytes))
+
+    def set(self, name, value):
+        """Set an item of the info dictionary of the current transfer."""
+        transfer = self.current
+
+        if transfer is not None:
+            transfer.info[name] = value
+
+    def count(self, n):
+        """Add n bytes to the current transfer."""
+        transfer = self.current
+
+        if transfer is not None:
+            transfer.bytes += n
+            t = transfer.elapsed()
+
+            if t >= self._next_sample:
+                transfer.samples.append((t, transfer.bytes))
+                self._next_sample = t + self.interval
+
+    def wrap(self, callback, extra=0):
+        """Return a callback, which counts the data passed to it.
+
+        The given callback (which may be None) is called after that. Extra is
+        added to the length of each block of data, e.g. for line endings
+        removed before the callback is called.
+        """
+        count = self.count
+
+        def counting_callback(data):
+            count(len(data) + extra)
+
+            if callback is not None:
+                callback(data)
+
+        return counting_callback
+
+    def end(self, resp=None):
+        """Finish recording the current transfer."""
+        transfer = self.current
+
+        if transfer is not None:
+            transfer.marks.append(('done', transfer.elapsed()))
+            transfer.resp = resp
+            self.transfers.append(transfer)
+            self.current = None
+
+            if len(self.transfers) > self.maxlen:
+                self.transfers.pop(0)
+
+    def clear(self):
+        """Discard all recorded transfers."""
+        self.transfers = []
+        self.current = None
+
+    def to_json(self):
+        """Return the statistics of all recorded transfers as a JSON string."""
+        return json.dumps([transfer.to_dict() for transfer in self.transfers])
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""Incremental synchronization of local and remote directory trees.
+
+Only files which are missing or changed on the other side are transferred.
+Files are compared by size and modification time, using the "size" and
+"modify" facts of MLSD listings or, if the server doesn't support MLSD, the
+SIZE and MDTM commands.
+
+Example::
+
+    >>> from ftpsync import sync_up, summary
+    >>> report = sync_up(ftp, '/data', 'backup/data', dry_run=True)
+    >>> print(summary(report))
+    3 of 120 files, 10240 of 5242880 bytes to transfer, 5232640 bytes saved
+    >>> report = sync_up(ftp, '/data', 'backup/data')
+
+"""
+
+import os
+import time
+
+from ftplib import error_perm, joinpath
+from ftplisting import UNKNOWN, list_parsed, parse_modify
+
+_S_IFDIR = 0x4000
+
+
+def _mtime(t):
+    """Convert a timestamp to an integer of the form YYYYMMDDHHMMSS in UTC."""
+    tm = time.gmtime(t)
+    return ((((tm[0] * 100 + tm[1]) * 100 + tm[2]) * 100 + tm[3]) * 100 + tm[4]) * 100 + tm[5]
+
+
+def _timegm(modify):
+    """Convert a YYYYMMDDHHMMSS integer in UTC to seconds since 1970-01-01."""
+    year, rest = divmod(modify, 10000000000)
+    month, rest = divmod(rest, 100000000)
+    day, rest = divmod(rest, 1000000)
+    hour, rest = divmod(rest, 10000)
+    minute, second = divmod(rest, 100)
+    # Days since 1970-01-01 of the given date (proleptic Gregorian calendar)
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (9 if month <= 2 else -3)) + 2) // 5 + day - 1
+    days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+    return ((days * 24 + hour) * 60 + minute) * 60 + second
+
+
+def _plan(src_size, src_mtime, dst, resume):
+    """Return the offset to start a transfer at or None to skip the file.
+
+    dst is a (size, mtime) tuple for the destination file or None, if it
+    does not exist.
+    """
+    if dst is None:
+        return 0
+
+    dst_size, dst_mtime = dst
+    # The destination was written after the source was last modified?
+    current = dst_mtime == UNKNOWN or src_mtime == UNKNOWN or dst_mtime >= src_mtime
+
+    if dst_size == src_size and current:
+        return None
+
+    if resume and current and 0 < dst_size < src_size:
+        return dst_size
+
+    return 0
+
+
+class _Sync:
+    def __init__(self, ftp, dry_run, mtime, resume, blocksize, callback):
+        self.ftp = ftp
+        self.dry_run = dry_run
+        self.mtime = mtime
+        self.resume = resume
+        self.blocksize = blocksize
+        self.callback = callback
+        self.report = {
+            'files': 0,
+            'transfers': [],
+            'bytes_total': 0,
+            'bytes_transferred': 0,
+            'bytes_saved': 0,
+        }
+
+    def list_remote(self, path):
+        """Return a dict mapping names to (is_dir, size, modify) or None.
+
+        Returns None if the directory does not exist. Size and modify are -1
+        if they are unknown.
+        """
+        ftp = self.ftp
+        entries = {}
+
+        try:
+            if ftp._mlsd_supported():
+                try:
+                    for name, facts in ftp.mlsd(path):
+                        type = facts.get('type')
+
+                        if type not in ('cdir', 'pdir'):
+                            entries[name] = (type == 'dir', int(facts.get('size', UNKNOWN)),
+                                             parse_modify(facts.get('modify')))
+
+                    ftp.use_mlsd = True
+                    return entries
+                except error_perm as exc:
+                    if ftp.use_mlsd or exc.args[0][:3] not in {'500', '502'}:
+                        raise
+
+                    ftp.use_mlsd = False
+
+            # LIST times are in the server's time zone; ask for MDTM instead
+            for entry in list_parsed(ftp, path):
+                if entry.name not in ('.', '..'):
+                    entries[entry.name] = (entry.type == 'dir', entry.size, UNKNOWN)
+        except error_perm as exc:
+            # Some servers (e.g. pyftpdlib) reply 501 for missing directories
+            if exc.args[0][:3] in {'501', '550'}:
+                return None
+            raise
+
+        return entries
+
+    def select_facts(self):
+        """Select the facts of MLSD listings once for all directories.
+
+        Returns the facts selected before, to be passed to restore_facts(),
+        or None if the selection was not changed or is unknown.
+        """
+        ftp = self.ftp
+
+        if not ftp._mlsd_supported():
+            return None
+
+        # The reply to FEAT marks the facts selected for the session with '*'
+        features = ftp.features(refresh=True)
+        selected = None
+
+        if features is not None and 'MLST' in features:
+            selected = [fact[:-1] for fact in features['MLST'].split(';') if fact[-1:] == '*']
+            names = [fact.lower() for fact in selected]
+
+            if 'type' in names and 'size' in names and 'modify' in names:
+                return None
+
+        try:
+            ftp.sendcmd('OPTS MLST type;size;modify;')
+        except error_perm:
+            return None
+
+        return None if selected is None else ''.join(fact + ';' for fact in selected)
+
+    def restore_facts(self, facts):
+        """Select the facts returned by select_facts() again."""
+        if facts is not None:
+            try:
+                self.ftp.sendcmd('OPTS MLST ' + facts)
+            except error_perm:
+                pass
+
+    def remote_stat(self, path, size, modify):
+        """Fill in an unknown size or modification time of a remote file."""
+        ftp = self.ftp
+
+        if size == UNKNOWN:
+            try:
+                size = ftp.size(path)
+            except error_perm:
+                pass
+
+        if modify == UNKNOWN:
+            try:
+                modify = parse_modify(ftp.sendcmd('MDTM ' + path)[4:])
+            except error_perm:
+                pass
+
+        return size, modify
+
+    def add(self, src, size, mtime, dst, transfer):
+        report = self.report
+        report['files'] += 1
+        report['bytes_total'] += size
+        offset = _plan(size, mtime, dst, self.resume)
+
+        if offset is None:
+            report['bytes_saved'] += size
+            return
+
+        report['transfers'].append((src, offset, size))
+        report['bytes_transferred'] += size - offset
+        report['bytes_saved'] += offset
+
+        if not self.dry_run:
+            transfer(offset, mtime)
+
+    def sync_up(self, local, remote):
+        ftp = self.ftp
+        entries = self.list_remote(remote)
+
+        if entries is None:
+            entries = {}
+
+            if not self.dry_run:
+                ftp.mkd(remote)
+
+        for name in sorted(os.listdir(local)):
+            src = local + '/' + name
+            dst = joinpath(remote, name)
+            st = os.stat(src)
+            info = entries.get(name)
+
+            if st[0] & _S_IFDIR:
+                self.sync_up(src, dst)
+                continue
+
+            if info is not None:
+                info = self.remote_stat(dst, info[1], info[2])
+
+            self.add(src, st[6], _mtime(st[8]), info,
+                     lambda offset, mtime: self.put(src, dst, offset, mtime))
+
+    def put(self, src, dst, offset, mtime):
+        ftp = self.ftp
+
+        with open(src, 'rb') as fp:
+            if offset:
+                fp.seek(offset)
+
+            ftp.storbinary('STOR ' + dst, fp, self.blocksize, self.callback, offset or None)
+
+        if self.mtime:
+            try:
+                ftp.voidcmd('MFMT %d %s' % (mtime, dst))
+            except error_perm as exc:
+                # Command not recognized / implemented?
+                if exc.args[0][:3] not in {'500', '502'}:
+                    raise
+
+                self.mtime = False
+
+    def sync_down(self, remote, local):
+        entries = self.list_remote(remote)
+
+        if entries is None:
+            raise error_perm("550 %s: no such directory" % remote)
+
+        try:
+            os.stat(local)
+        except OSError:
+            if not self.dry_run:
+                os.mkdir(local)
+
+        for name in sorted(entries):
+            is_dir, size, modify = entries[name]
+            src = joinpath(remote, name)
+            dst = local + '/' + name
+
+            if is_dir:
+                self.sync_down(src, dst)
+                continue
+
+            try:
+                st = os.stat(dst)
+                info = (st[6], _mtime(st[8]))
+            except OSError:
+                info = None
+
+            size, modify = self.remote_stat(src, size, modify)
+            self.add(src, size, modify, info,
+                     lambda offset, mtime: self.get(src, dst, offset, mtime))
+
+    def get(self, src, dst, offset, mtime):
+        callback = self.callback
+
+        with open(dst, 'ab' if offset else 'wb') as fp:
+            if callback:
+                def write(data):
+                    fp.write(data)
+                    callback(data)
+            else:
+                write = fp.write
+
+            self.ftp.retrbinary('RETR ' + src, write, self.blocksize, offset or None)
+
+        # Not available on MicroPython
+        if self.mtime and mtime != UNKNOWN and hasattr(os, 'utime'):
+            t = _timegm(mtime)
+            os.utime(dst, (t, t))
+
+
+def sync_up(ftp, local, remote, dry_run=False, mtime=True, resume=True, blocksize=8192,
+            callback=None):
+    """Upload new and changed files of a local directory tree.
+
+    A file is transferred if it does not exist on the server, or if the sizes
+    differ or the local file was modified after the remote one. If the remote
+    file is smaller and not older than the local one, the upload is resumed
+    with REST. Missing remote directories are created. Nothing is deleted.
+
+    If the server supports MLSD, the facts type, size and modify are
+    selected for the session once with OPTS MLST, if needed, and the facts
+    selected before are restored afterwards. Servers without FEAT don't
+    tell which facts are selected; then the selection is kept.
+
+    Args:
+      ftp: A connected and logged-in FTP (or FTP_TLS) instance.
+      local: The local directory.
+      remote: The remote directory.
+      dry_run: If true, only compare the files and return the report.
+               [default: False]
+      mtime: Whether to set the modification time of uploaded files with the
+             MFMT command, if the server supports it.  [default: True]
+      resume: Whether to resume partially transferred files.  [default: True]
+      blocksize: The block size for transfers.  [default: 8192]
+      callback: An optional single parameter callable, which is called with
+                each block of data uploaded.  [default: None]
+
+    Returns:
+      A dictionary with the number of files compared ('files'), a list of
+      (source path, offset, size) tuples of the files (to be) transferred
+      ('transfers'), the total number of bytes of all files, the bytes (to
+      be) transferred and the bytes saved by not transferring unchanged files
+      and resuming partial ones.
+    """
+    ftp.voidcmd('TYPE I')
+    syncer = _Sync(ftp, dry_run, mtime, resume, blocksize, callback)
+    facts = syncer.select_facts()
+
+    try:
+        syncer.sync_up(local.rstrip('/') or '/', remote)
+    finally:
+        syncer.restore_facts(facts)
+
+    return syncer.report
+
+
+def sync_down(ftp, remote, local, dry_run=False, mtime=True, resume=True, blocksize=8192,
+              callback=None):
+    """Download new and changed files of a remote directory tree.
+
+    The counterpart of ``sync_up()``, see there for the arguments and the
+    return value; the callback is called with each block of data
+    downloaded. Setting the modification time of downloaded files is
+    not supported on MicroPython.
+    """
+    ftp.voidcmd('TYPE I')
+    syncer = _Sync(ftp, dry_run, mtime, resume, blocksize, callback)
+    facts = syncer.select_facts()
+
+    try:
+        syncer.sync_down(remote, local.rstrip('/') or '/')
+    finally:
+        syncer.restore_facts(facts)
+
+    return syncer.report
+
+
+def summary(report):
+    """Return a one line summary of a report returned by the sync functions."""
+    return "%d of %d files, %d of %d bytes to transfer, %d bytes saved" % (
+        len(report['transfers']), report['files'], report['bytes_transferred'],
+        report['bytes_total'], report['bytes_saved'])
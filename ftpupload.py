@@ -19,7 +19,7 @@ def basename(path):
 
 
 def upload(ftp, path, remote_path=None, blocksize=8192, callback=None,
-           rest=None):
+           rest=None, buf=None):
     if remote_path:
         remote_dir, remote_path = split(remote_path)
 
@@ -30,6 +30,10 @@ def upload(ftp, path, remote_path=None, blocksize=8192, callback=None,
         remote_path = basename(path)
 
     with open(path, 'rb') as fp:
+        if buf is not None:
+            return ftp.storbinary_from('STOR %s' % remote_path, fp, buf,
+                                       callback=callback, rest=rest)
+
         return ftp.storbinary('STOR %s' % remote_path, fp, blocksize=blocksize,
                               callback=callback, rest=rest)
 
@@ -2,7 +2,7 @@
 #
 # Install micropython-ftplib to a MicroPython board using the rshell tool
 
-MODULES=('ftplib.py' 'ftplibtls.py' 'ftpupload.py' 'ftpcp.py')
+MODULES=('ftplib.py' 'ftplibtls.py' 'ftpupload.py' 'ftpdownload.py' 'ftppool.py' 'ftpasync.py' 'ftplisting.py' 'ftpsync.py' 'ftpstats.py' 'ftpcp.py' 'ftpbatch.py')
 BUILDDIR="build"
 DESTDIR="${DESTDIR:-/pyboard/lib}"
 RSHELL_CMD="${RSHELL:-rshell} --quiet -b ${BAUD:-9600} -p ${PORT:-/dev/ttyACM0}"
@@ -2,7 +2,7 @@
 #
 # Install micropython-ftplib to a MicroPython board using the mpremote tool
 
-MODULES=('ftplib.py' 'ftplibtls.py' 'ftpupload.py' 'ftpcp.py')
+MODULES=('ftplib.py' 'ftplibtls.py' 'ftpupload.py' 'ftpdownload.py' 'ftppool.py' 'ftpasync.py' 'ftplisting.py' 'ftpsync.py' 'ftpstats.py' 'ftpcp.py' 'ftpbatch.py')
 BUILDDIR="build"
 DESTDIR="${DESTDIR:-:/lib}"
 
@@ -45,9 +45,16 @@ setup(
     maintainer_email='chris@chrisarndt.de',
     license='Python Software Foundation License',
     py_modules=[
+        'ftpasync',
+        'ftpbatch',
         'ftpcp',
+        'ftpdownload',
         'ftplib',
         'ftplibtls',
-        'ftpuload',
+        'ftplisting',
+        'ftppool',
+        'ftpstats',
+        'ftpsync',
+        'ftpupload',
     ]
 )
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the throughput of download_segmented() for different segment counts.
+
+Start the test FTP server with write permission and a per-connection transfer
+rate limit, which simulates a link where the throughput of a single TCP stream
+is bound by the round-trip time, e.g.::
+
+    python3 tests/pyftpdlib-server.py -w -p 2121 -l 250000 tests/ftproot
+    python3 tests/bench_download_segmented.py localhost 2121
+
+With an ``ftps://`` URL, FTP_TLS sessions with protected data connections
+are used instead (the server needs the ``-s`` option). The certificate file
+to verify the server with may be given after the URL::
+
+    python3 tests/bench_download_segmented.py ftps://localhost:2121 tests/keycert.pem
+
+Each downloaded file is compared with the uploaded data.
+
+"""
+
+import io
+import time
+
+from ftplib import FTP
+from ftplibtls import FTP_TLS, ssl
+from ftpdownload import download_segmented
+
+FILENAME = 'bench_segmented.bin'
+SIZE = 4 * 1024 * 1024
+
+
+def bench(host, port=21, size=SIZE, segment_counts=(1, 2, 4, 8), tls=False,
+          cafile=None):
+    def connect():
+        if not tls:
+            return FTP(host, port, user='joedoe', passwd='abc123')
+
+        ftp = FTP_TLS(host, port, ssl_context=ssl.create_default_context(cafile=cafile),
+                      server_hostname='example.com')
+        ftp.login('joedoe', 'abc123')
+        ftp.prot_p()
+        return ftp
+
+    # A pattern, which reveals misplaced segments
+    data = bytes(i % 251 for i in range(size))
+
+    with connect() as ftp:
+        ftp.storbinary('STOR ' + FILENAME, io.BytesIO(data))
+
+        try:
+            for segments in segment_counts:
+                start = time.time()
+                download_segmented(connect, FILENAME, FILENAME, segments=segments)
+                elapsed = time.time() - start
+                print("%i segment(s): %.2f s, %.1f KiB/s" %
+                      (segments, elapsed, size / elapsed / 1024))
+
+                with open(FILENAME, 'rb') as fp:
+                    assert fp.read() == data, "downloaded data differs"
+        finally:
+            ftp.delete(FILENAME)
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: bench_download_segmented.py <hostname> [<port>]")
+        print("       bench_download_segmented.py ftps://<hostname>[:<port>] [<cafile>]")
+        sys.exit(2)
+
+    try:
+        if sys.argv[1].startswith('ftps://'):
+            host, _, port = sys.argv[1][7:].partition(':')
+            bench(host, int(port or 21), tls=True,
+                  cafile=sys.argv[2] if len(sys.argv) > 2 else 'tests/keycert.pem')
+        else:
+            bench(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 21)
+    finally:
+        if FILENAME in os.listdir():
+            os.remove(FILENAME)
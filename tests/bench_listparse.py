@@ -0,0 +1,52 @@
+#!/usr/bin/env micropython
+# -*- coding: utf-8 -*-
+"""Measure the speed of parsing LIST output with ftplisting.parse_list_line().
+
+Runs with CPython and MicroPython and needs no FTP server::
+
+    MICROPYPATH=`pwd` micropython tests/bench_listparse.py [<number of lines>]
+
+"""
+
+from ftplib import ticks_diff, ticks_ms
+from ftplisting import parse_list_line
+
+LINES = {
+    'unix': [
+        'drwxr-xr-x   2 root     wheel        1024 Jan  3  1994 bin',
+        '-rw-r--r--   1 ftp      ftp       5240123 Sep  5 13:43 sensor log 2024.csv',
+        'lrwxrwxrwx   1 root     root            7 Nov 17  1993 lib -> usr/lib',
+        '-rw-r--r--   1 owner        312 Aug  1 09:12 no_group.txt',
+    ],
+    'dos': [
+        '01-16-24  02:15PM       <DIR>          Some Directory',
+        '01-16-2024  11:05AM           5240123 sensor log 2024.csv',
+        '2024-01-16  14:15              1234 iso.txt',
+    ],
+}
+
+
+def bench(count=10000):
+    today = (2024, 10, 1)
+
+    for fmt, lines in LINES.items():
+        n = len(lines)
+
+        # All sample lines are from 1993 to 2024 and parse to plausible dates
+        for line in lines:
+            modify = parse_list_line(line, today).modify
+            assert 19930101000000 <= modify <= 20241231235959, (line, modify)
+        start = ticks_ms()
+
+        for i in range(count):
+            parse_list_line(lines[i % n], today)
+
+        elapsed = ticks_diff(ticks_ms(), start)
+        print("%-4s %i lines in %i ms, %.1f us/line" %
+              (fmt, count, elapsed, elapsed * 1000 / count))
+
+
+if __name__ == '__main__':
+    import sys
+
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
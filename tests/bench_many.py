@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare transfers of many small files one by one and in a batch.
+
+Uploads and downloads N files of SIZE bytes with ``storbinary()`` and
+``retrbinary()`` for each file and with ``ftpbatch.put_many()`` and
+``get_many()`` and prints the time for each and per file.
+
+Like ``bench_pipeline.py``, the script can (with CPython) forward the
+control connection through a proxy, which delays the data in each direction
+by half of the given round trip time. The test FTP server must be started
+with write permission, e.g.::
+
+    python3 tests/pyftpdlib-server.py -w -p 2121 tests/ftproot &
+    python3 tests/bench_many.py localhost 2121 -r 20 -n 100
+
+Options::
+
+    -n N        number of files (default: 100)
+    -r MS       emulated round trip time in milliseconds (default: 0)
+    -s SIZE     size of each file in bytes (default: 4096)
+
+"""
+
+import os
+import sys
+
+from ftplib import FTP, ticks_diff, ticks_ms
+
+from ftpbatch import delete_many, get_many, put_many
+
+from bench_pipeline import start_proxy
+
+TMPDIR = 'bench_many.tmp'
+
+
+def timed(name, n, func, *args):
+    start = ticks_ms()
+    errors = func(*args)
+    ms = ticks_diff(ticks_ms(), start)
+    print("%-28s %8i ms %8.2f ms/file" % (name, ms, ms / n))
+
+    if errors:
+        print("Errors:", errors)
+
+    return ms
+
+
+def put_each(ftp, files):
+    for local, remote in files:
+        with open(local, 'rb') as fp:
+            ftp.storbinary('STOR ' + remote, fp)
+
+
+def get_each(ftp, files):
+    for remote, local in files:
+        with open(local, 'wb') as fp:
+            ftp.retrbinary('RETR ' + remote, fp.write)
+
+
+def bench(ftp, n, size):
+    names = ['bench_many_%i.bin' % i for i in range(n)]
+    local = [TMPDIR + '/' + name for name in names]
+    data = bytes(size)
+
+    for path in local:
+        with open(path, 'wb') as fp:
+            fp.write(data)
+
+    timed('STOR, one by one', n, put_each, ftp, zip(local, names))
+    timed('RETR, one by one', n, get_each, ftp, zip(names, local))
+    delete_many(ftp, names)
+    timed('put_many', n, put_many, ftp, zip(local, names))
+    timed('get_many', n, get_many, ftp, zip(names, local))
+    delete_many(ftp, names)
+
+    for path in local:
+        os.remove(path)
+
+
+def main(args):
+    n = 100
+    rtt = 0
+    size = 4096
+    hostport = []
+
+    while args:
+        arg = args.pop(0)
+
+        if arg == '-n':
+            n = int(args.pop(0))
+        elif arg == '-r':
+            rtt = int(args.pop(0))
+        elif arg == '-s':
+            size = int(args.pop(0))
+        elif arg in ('-h', '--help'):
+            print(__doc__)
+            return
+        else:
+            hostport.append(arg)
+
+    if not hostport:
+        print("Usage: bench_many.py [options] <hostname> [<port>]")
+        return 2
+
+    host = hostport[0]
+    port = int(hostport[1]) if len(hostport) > 1 else 21
+
+    if rtt:
+        port = start_proxy(host, port, rtt)
+        host = '127.0.0.1'
+
+    print("%i files of %i bytes, round trip time %i ms" % (n, size, rtt))
+
+    try:
+        os.mkdir(TMPDIR)
+    except OSError:
+        pass
+
+    with FTP(host, port) as ftp:
+        ftp.login('joedoe', 'abc123')
+        bench(ftp, n, size)
+
+    os.rmdir(TMPDIR)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) or 0)
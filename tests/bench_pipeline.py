@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare sequential and pipelined batches of commands.
+
+Creates, renames, checks the size of and deletes N directories or files,
+one command after the other and with the functions of the ``ftpbatch``
+module, and prints the time for each batch.
+
+On localhost, a round trip takes only microseconds. To show the effect of
+latency, the script can (with CPython) forward the control connection through
+a proxy, which delays the data in each direction by half of the given round
+trip time. The test FTP server must be started with write permission, e.g.::
+
+    python3 tests/pyftpdlib-server.py -w -p 2121 tests/ftproot &
+    python3 tests/bench_pipeline.py localhost 2121 -r 20 -n 100
+
+Options::
+
+    -n N        number of items per batch (default: 100)
+    -r MS       emulated round trip time in milliseconds (default: 0)
+    -w WINDOW   the maximum number of commands in flight (default: 16)
+
+"""
+
+import sys
+
+from ftplib import FTP, error_perm, ticks_diff, ticks_ms
+
+from ftpbatch import delete_many, mkd_many, pipeline, rename_many, size_many
+
+
+def start_proxy(host, port, rtt):
+    import socket
+    import threading
+    import time
+
+    delay = rtt / 2000
+
+    def forward(src, dst):
+        # Deliver each chunk of data after the delay, keeping the order
+        chunks = []
+        cond = threading.Condition()
+
+        def send():
+            while True:
+                with cond:
+                    while not chunks:
+                        cond.wait()
+                    due, data = chunks.pop(0)
+
+                time.sleep(max(0, due - time.monotonic()))
+
+                if not data:
+                    dst.close()
+                    return
+
+                dst.sendall(data)
+
+        threading.Thread(target=send, daemon=True).start()
+
+        while True:
+            try:
+                data = src.recv(65536)
+            except OSError:
+                data = b''
+
+            with cond:
+                chunks.append((time.monotonic() + delay, data))
+                cond.notify()
+
+            if not data:
+                return
+
+    def accept(listener):
+        while True:
+            client, _ = listener.accept()
+            server = socket.create_connection((host, port))
+            threading.Thread(target=forward, args=(client, server), daemon=True).start()
+            threading.Thread(target=forward, args=(server, client), daemon=True).start()
+
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    threading.Thread(target=accept, args=(listener,), daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def timed(name, func, *args):
+    start = ticks_ms()
+    func(*args)
+    ms = ticks_diff(ticks_ms(), start)
+    print("%-28s %8i ms" % (name, ms))
+    return ms
+
+
+def sequential(ftp, cmds):
+    for cmd in cmds:
+        try:
+            ftp.sendcmd(cmd)
+        except error_perm:
+            pass
+
+
+def create_files(ftp, files):
+    for name in files:
+        ftp.storbinary('STOR ' + name, _Zero(1000))
+
+
+def bench(ftp, direct, n, window):
+    dirs = ['bench_pipe_%i' % i for i in range(n)]
+    renamed = [name + '_x' for name in dirs]
+    files = ['bench_pipe_%i.bin' % i for i in range(n)]
+
+    timed('MKD, sequential', sequential, ftp, ['MKD ' + name for name in dirs])
+    timed('RMD, sequential', sequential, ftp, ['RMD ' + name for name in dirs])
+    timed('MKD, pipelined', mkd_many, ftp, dirs, window)
+    timed('RNFR/RNTO, sequential', lambda: [ftp.rename(a, b) for a, b in zip(dirs, renamed)])
+    timed('RNFR/RNTO, pipelined', rename_many, ftp, zip(renamed, dirs), window)
+    timed('RMD, pipelined', pipeline, ftp, ['RMD ' + name for name in dirs], window)
+
+    # Files are created over a connection without the delay
+    create_files(direct, files)
+    ftp.voidcmd('TYPE I')
+    timed('SIZE, sequential', lambda: [ftp.size(name) for name in files])
+    timed('SIZE, pipelined', size_many, ftp, files, window)
+    timed('DELE, sequential', sequential, ftp, ['DELE ' + name for name in files])
+    create_files(direct, files)
+    timed('DELE, pipelined', delete_many, ftp, files, window)
+
+
+class _Zero:
+    def __init__(self, size):
+        self.size = size
+
+    def read(self, n):
+        n = min(n, self.size)
+        self.size -= n
+        return bytes(n)
+
+
+def main(args):
+    n = 100
+    rtt = 0
+    window = 16
+    hostport = []
+
+    while args:
+        arg = args.pop(0)
+
+        if arg == '-n':
+            n = int(args.pop(0))
+        elif arg == '-r':
+            rtt = int(args.pop(0))
+        elif arg == '-w':
+            window = int(args.pop(0))
+        elif arg in ('-h', '--help'):
+            print(__doc__)
+            return
+        else:
+            hostport.append(arg)
+
+    if not hostport:
+        print("Usage: bench_pipeline.py [options] <hostname> [<port>]")
+        return 2
+
+    host = hostport[0]
+    port = int(hostport[1]) if len(hostport) > 1 else 21
+
+    direct = FTP(host, port)
+    direct.login('joedoe', 'abc123')
+
+    if rtt:
+        port = start_proxy(host, port, rtt)
+        host = '127.0.0.1'
+
+    print("%i items, window %i, round trip time %i ms" % (n, window, rtt))
+
+    with FTP(host, port) as ftp:
+        ftp.login('joedoe', 'abc123')
+        bench(ftp, direct, n, window)
+
+    direct.quit()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) or 0)
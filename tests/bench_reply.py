@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Microbenchmark for reading control connection responses.
+
+Reads canned single- and multi-line responses from an in-memory file and
+reports the time per response and the memory allocated for reading each of
+them once (with MicroPython) or the sum of the peak memory used for each
+(with CPython) for:
+
+* legacy: the previous implementation, which decoded every line and
+  concatenated multi-line responses string by string
+* getresp: ``FTP.getresp()``, which returns the decoded response
+* getreply: ``FTP.getreply()`` without accessing the text of the reply
+* raw: the bytes-level reader used internally for TYPE, REST and the
+  replies to transfer commands
+
+Exits with an error if getreply or raw allocate more than legacy.
+
+Runs with CPython and the MicroPython unix port::
+
+    python3 tests/bench_reply.py [N]
+    MICROPYPATH=`pwd` micropython tests/bench_reply.py [N]
+
+"""
+
+import gc
+import sys
+
+try:
+    import io
+except ImportError:
+    import uio as io
+
+from ftplib import FTP, error_perm, error_proto, error_temp, ticks_diff, ticks_us
+
+RESPONSES = (
+    b'200 Type set to: Binary.\r\n',
+    b'150 File status okay. About to open data connection.\r\n',
+    b'226 Transfer complete.\r\n',
+    b'211-Features supported:\r\n EPRT\r\n EPSV\r\n MDTM\r\n MFMT\r\n'
+    b' MLST type*;perm*;size*;modify*;unique*;unix.mode;unix.uid;unix.gid;\r\n'
+    b' REST STREAM\r\n SIZE\r\n TVFS\r\n UTF8\r\n211 End FEAT.\r\n',
+)
+ROUNDS = 5
+
+
+class LegacyFTP(FTP):
+    """The response reader before it worked on bytes."""
+
+    def getline(self):
+        line = self.file.readline(self.maxline + 1).decode()
+        if len(line) > self.maxline:
+            raise Exception("got more than %d bytes" % self.maxline)
+        if not line:
+            raise EOFError
+        return line.rstrip('\r\n')
+
+    def getmultiline(self):
+        line = self.getline()
+        if line[3:4] == '-':
+            code = line[:3]
+            while 1:
+                nextline = self.getline()
+                line = line + ('\n' + nextline)
+                if nextline[:3] == code and nextline[3:4] != '-':
+                    break
+        return line
+
+    def getresp(self):
+        resp = self.getmultiline()
+        self.lastresp = resp[:3]
+        c = resp[:1]
+
+        if c in {'1', '2', '3'}:
+            return resp
+        if c == '4':
+            raise error_temp(resp)
+        if c == '5':
+            raise error_perm(resp)
+        raise error_proto(resp)
+
+
+def run(name, ftp, read, n):
+    data = b''.join(RESPONSES) * n
+    count = len(RESPONSES) * n
+    us = None
+
+    # Best of several rounds, with the garbage collector enabled
+    for _ in range(ROUNDS):
+        ftp.file = io.BytesIO(data)
+        start = ticks_us()
+        for _ in range(count):
+            read()
+        t = ticks_diff(ticks_us(), start)
+        us = t if us is None else min(us, t)
+
+    # Measure the memory used for reading each response once
+    ftp.file = io.BytesIO(b''.join(RESPONSES))
+    gc.collect()
+
+    if hasattr(gc, 'mem_alloc'):
+        gc.disable()
+        before = gc.mem_alloc()
+        for _ in RESPONSES:
+            read()
+        allocated = gc.mem_alloc() - before
+        gc.enable()
+    else:
+        import tracemalloc
+        allocated = 0
+        for _ in RESPONSES:
+            tracemalloc.start()
+            read()
+            allocated += tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    print("%-10s %8.2f us/response %8d bytes" % (name, us / count, allocated))
+    return allocated
+
+
+def main(args):
+    n = int(args[0]) if args else 1000
+    legacy = LegacyFTP()
+    ftp = FTP()
+    limit = run('legacy', legacy, legacy.getresp, n)
+    run('getresp', ftp, ftp.getresp, n)
+    failed = False
+
+    for name, read in (('getreply', ftp.getreply), ('raw', ftp._getrawresp)):
+        if run(name, ftp, read, n) > limit:
+            print("%s allocates more than legacy" % name)
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) or 0)
@@ -0,0 +1,101 @@
+#!/usr/bin/env micropython
+# -*- coding: utf-8 -*-
+"""Measure heap allocations of retrbinary() and storbinary() vs.
+retrbinary_into() and storbinary_from().
+
+Needs the MicroPython unix port (uses gc.mem_alloc()) and the test FTP server
+started with write permission (see README), e.g.::
+
+    python3 tests/pyftpdlib-server.py -w -p 2121 tests/ftproot
+    MICROPYPATH=`pwd` micropython tests/bench_retrbinary_alloc.py localhost 2121
+
+Two files of different length are uploaded and then downloaded with each
+method. The difference of the amount of memory allocated for the two
+transfers, divided by the difference in the number of blocks, gives the number
+of bytes allocated per block. Exits with an error if retrbinary_into() or
+storbinary_from() allocate any memory per block.
+
+"""
+
+import gc
+import io
+
+from ftplib import FTP
+
+BLOCKSIZE = 1024
+SMALL = 16
+LARGE = 256
+
+
+def noop(data):
+    pass
+
+
+def measure(func, *args):
+    gc.collect()
+    gc.disable()
+    try:
+        before = gc.mem_alloc()
+        func(*args)
+        return gc.mem_alloc() - before
+    finally:
+        gc.enable()
+
+
+def report(name, allocs):
+    per_block = (allocs[1] - allocs[0]) / (LARGE - SMALL)
+    print("%-16s %6i / %6i bytes allocated (%i / %i blocks), %.1f bytes/block" %
+          (name, allocs[0], allocs[1], SMALL, LARGE, per_block))
+    # Allocations, which don't depend on the number of blocks, but differ
+    # between transfers (e.g. for PASV replies of different length), add
+    # less than a byte per block. Any allocation per block adds at least one.
+    return int(per_block)
+
+
+def bench(host, port=21):
+    if not hasattr(gc, 'mem_alloc'):
+        print("This benchmark requires MicroPython's gc.mem_alloc().")
+        return 1
+
+    buf = bytearray(BLOCKSIZE)
+    # Names of the same length, so the commands allocate the same
+    names = ['bench_%03i.bin' % nblocks for nblocks in (SMALL, LARGE)]
+    failed = []
+
+    with FTP(host, port) as ftp:
+        ftp.login('joedoe', 'abc123')
+
+        for name, func, arg in (('storbinary', ftp.storbinary, BLOCKSIZE),
+                                ('storbinary_from', ftp.storbinary_from, buf)):
+            files = [io.BytesIO(bytes(nblocks * BLOCKSIZE)) for nblocks in (SMALL, LARGE)]
+            allocs = [measure(func, 'STOR ' + filename, fp, arg)
+                      for filename, fp in zip(names, files)]
+
+            # The methods using the buffer must not allocate per block
+            if report(name, allocs) and arg is buf:
+                failed.append(name)
+
+        for name, func, arg in (('retrbinary', ftp.retrbinary, BLOCKSIZE),
+                                ('retrbinary_into', ftp.retrbinary_into, buf)):
+            allocs = [measure(func, 'RETR ' + filename, noop, arg) for filename in names]
+
+            if report(name, allocs) and arg is buf:
+                failed.append(name)
+
+        for filename in names:
+            ftp.delete(filename)
+
+    for name in failed:
+        print("%s allocates memory per block" % name)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: bench_retrbinary_alloc.py <hostname> [<port>]")
+        sys.exit(2)
+
+    sys.exit(bench(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 21))
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark suite for ftplib against the pyftpdlib test FTP server.
+
+Measures upload and download throughput for several block sizes in passive
+and active mode, retrlines() vs. retrbinary(), PROT P vs. PROT C (with an
+ftps:// URL), the speed of listing directories with MLSD, LIST, NLST and STAT
+(use e.g. -l 10 for small ones), the latency of simple commands and the time
+to connect and log in, e.g. to compare explicit (ftps://) and implicit FTPS
+(ftpsi://), which saves the AUTH TLS round trip. Results are printed and,
+with -o, written to a JSON file.
+Pass the JSON file of an earlier run with -c to show the changes.
+
+Runs with CPython and the MicroPython unix port. With CPython, the test
+server(s) can be started by the script itself::
+
+    python3 tests/bench_suite.py --start-server -o results.json
+
+With MicroPython, prepare a root directory with the directories for the
+listing benchmarks (using CPython) and start the server(s) first::
+
+    python3 tests/bench_suite.py --setup tests/ftproot
+    python3 tests/pyftpdlib-server.py -w -p 2121 tests/ftproot &
+    python3 tests/pyftpdlib-server.py -w -s -C -p 2122 -c tests/keycert.pem tests/ftproot &
+    python3 tests/pyftpdlib-server.py -w -s -C -i -p 2123 -c tests/keycert.pem tests/ftproot &
+    MICROPYPATH=`pwd` micropython tests/bench_suite.py -o results.json \\
+        ftp://localhost:2121 ftps://localhost:2122 ftpsi://localhost:2123
+
+Options::
+
+    -o FILE          write results to FILE
+    -c FILE          compare results with those in FILE
+    -s BYTES         size of the file to transfer (default: 4 MiB)
+    -l N[,N...]      numbers of directory entries (default: 10000,100000)
+    -p PORT          port of the servers started with --start-server, the
+                     TLS servers use PORT + 1 (explicit) and PORT + 2
+                     (implicit) (default: 2121)
+    --setup ROOT     (CPython) create the listing directories in ROOT and exit
+    --start-server   (CPython) start plain and, if tests/keycert.pem exists,
+                     TLS test servers with a temporary root directory
+
+"""
+
+import sys
+
+try:
+    import json
+except ImportError:
+    import ujson as json
+
+from ftplib import FTP, ticks_diff, ticks_us
+
+USER = 'joedoe'
+PASSWD = 'abc123'
+SIZE = 4 * 1024 * 1024
+BLOCKSIZES = (1024, 8192, 65536)
+LISTING_SIZES = (10000, 100000)
+COMMANDS = ('NOOP', 'PWD', 'SIZE bench.bin', 'MDTM bench.bin', 'CWD .')
+REPEAT = 50
+LOGINS = 10
+CERTFILE = 'tests/keycert.pem'
+CAFILE = 'tests/cert.der'
+
+
+class ZeroFile:
+    """A file-like object returning size zero bytes."""
+
+    def __init__(self, size, line=None):
+        self.remaining = size
+        self.line = line
+
+    def read(self, n):
+        n = min(n, self.remaining)
+        self.remaining -= n
+
+        if self.line:
+            return (self.line * (n // len(self.line) + 1))[:n]
+
+        return bytes(n)
+
+
+def connect(url):
+    scheme, _, hostport = url.partition('://')
+    host, _, port = hostport.partition(':')
+    port = int(port or 21)
+
+    if scheme in ('ftps', 'ftpsi'):
+        from ftplibtls import FTP_TLS, ssl
+
+        if hasattr(ssl, "create_default_context"):
+            ctx = ssl.create_default_context(cafile=CERTFILE)
+        else:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            ctx.verify_mode = ssl.CERT_REQUIRED
+            ctx.load_verify_locations(cafile=CAFILE)
+
+        ftp = FTP_TLS(ssl_context=ctx, server_hostname="example.com",
+                      implicit=scheme == 'ftpsi')
+    else:
+        ftp = FTP()
+
+    ftp.connect(host, port)
+    ftp.login(USER, PASSWD)
+    return ftp
+
+
+def timed(func, *args):
+    start = ticks_us()
+    func(*args)
+    return ticks_diff(ticks_us(), start) / 1000000
+
+
+class Bench:
+    def __init__(self, size=SIZE, listing_sizes=LISTING_SIZES):
+        self.size = size
+        self.listing_sizes = listing_sizes
+        self.results = []
+
+    def add(self, name, value, unit, **params):
+        self.results.append({'name': name, 'params': params, 'value': value, 'unit': unit})
+        print("%-12s %-50s %14.3f %s" % (name, ' '.join('%s=%s' % kv for kv in
+                                                      sorted(params.items())), value, unit))
+
+    def throughput(self, ftp, url, **params):
+        size = self.size
+        blocksizes = BLOCKSIZES if 'prot' not in params else (8192,)
+        modes = ((True, 'passive'), (False, 'active')) if 'prot' not in params else \
+            ((True, 'passive'),)
+
+        for pasv, mode in modes:
+            ftp.set_pasv(pasv)
+
+            for blocksize in blocksizes:
+                t = timed(ftp.storbinary, 'STOR bench.bin', ZeroFile(size), blocksize)
+                self.add('upload', size / t, 'B/s', url=url, mode=mode, blocksize=blocksize,
+                         **params)
+                t = timed(ftp.retrbinary, 'RETR bench.bin', lambda data: None, blocksize)
+                self.add('download', size / t, 'B/s', url=url, mode=mode,
+                         blocksize=blocksize, **params)
+
+        ftp.set_pasv(True)
+
+    def lines(self, ftp, url):
+        ftp.storbinary('STOR bench.txt', ZeroFile(self.size, b'x' * 62 + b'\r\n'))
+
+        try:
+            t = timed(ftp.retrbinary, 'RETR bench.txt', lambda data: None)
+            self.add('retrbinary', self.size / t, 'B/s', url=url)
+            t = timed(ftp.retrlines, 'RETR bench.txt', lambda line: None)
+            self.add('retrlines', self.size / t, 'B/s', url=url)
+        finally:
+            ftp.delete('bench.txt')
+
+    def listings(self, ftp, url):
+        for n in self.listing_sizes:
+            path = 'list_%d' % n
+
+            try:
+                # SIZE is not allowed in ASCII mode by some servers
+                ftp.voidcmd('TYPE I')
+                ftp.size(path + '/0')
+            except Exception:
+                print("Skipping listing of %i entries, %s/ does not exist" % (n, path))
+                continue
+
+            t = timed(lambda: [None for _ in ftp.mlsd(path)])
+            self.add('mlsd', n / t, 'entries/s', url=url, entries=n)
+            t = timed(ftp.retrlines, 'LIST ' + path, lambda line: None)
+            self.add('list', n / t, 'entries/s', url=url, entries=n)
+            t = timed(ftp.nlst, path)
+            self.add('nlst', n / t, 'entries/s', url=url, entries=n)
+            # Over the control connection
+            ftp.use_stat = True
+            t = timed(lambda: ftp.dir(path, callback=lambda line: None))
+            ftp.use_stat = False
+            self.add('stat', n / t, 'entries/s', url=url, entries=n)
+
+    def latency(self, ftp, url):
+        ftp.voidcmd('TYPE I')
+
+        for cmd in COMMANDS:
+            times = []
+
+            for _ in range(REPEAT):
+                times.append(timed(ftp.sendcmd, cmd) * 1000)
+
+            times.sort()
+            self.add('latency', times[len(times) // 2], 'ms', url=url,
+                     cmd=cmd.split()[0])
+
+    def login(self, url):
+        times = []
+
+        for _ in range(LOGINS):
+            times.append(timed(lambda: connect(url).quit()) * 1000)
+
+        times.sort()
+        self.add('login', times[len(times) // 2], 'ms', url=url)
+
+    def run(self, url):
+        ftp = connect(url)
+
+        try:
+            if url.startswith('ftps'):
+                ftp.prot_p()
+                self.throughput(ftp, url, prot='P')
+                ftp.prot_c()
+                self.throughput(ftp, url, prot='C')
+                ftp.prot_p()
+            else:
+                self.throughput(ftp, url)
+
+            self.lines(ftp, url)
+            self.listings(ftp, url)
+            self.latency(ftp, url)
+            ftp.delete('bench.bin')
+        finally:
+            ftp.close()
+
+        self.login(url)
+
+
+def key(result):
+    return result['name'] + repr(sorted(result['params'].items()))
+
+
+def compare(results, filename):
+    with open(filename) as fp:
+        old = dict((key(r), r) for r in json.load(fp)['results'])
+
+    print("\nChanges compared to %s:" % filename)
+
+    for result in results:
+        prev = old.get(key(result))
+
+        if prev and prev['value']:
+            change = (result['value'] - prev['value']) * 100 / prev['value']
+            print("%-12s %-50s %+8.1f %%" % (result['name'], ' '.join(
+                '%s=%s' % kv for kv in sorted(result['params'].items())), change))
+
+
+def setup(root, listing_sizes=LISTING_SIZES):
+    import os
+
+    for n in listing_sizes:
+        path = os.path.join(root, 'list_%d' % n)
+        os.makedirs(path, exist_ok=True)
+
+        for i in range(n):
+            open(os.path.join(path, str(i)), 'wb').close()
+
+
+def start_servers(port, listing_sizes):
+    import os
+    import socket
+    import subprocess
+    import tempfile
+    import time
+
+    root = tempfile.mkdtemp()
+    setup(root, listing_sizes)
+    script = os.path.join(os.path.dirname(__file__), 'pyftpdlib-server.py')
+    servers = [(['-w', '-p', str(port)], 'ftp://localhost:%d' % port)]
+
+    if os.path.exists(CERTFILE):
+        servers.append((['-w', '-s', '-C', '-p', str(port + 1), '-c', CERTFILE],
+                        'ftps://localhost:%d' % (port + 1)))
+        servers.append((['-w', '-s', '-C', '-i', '-p', str(port + 2), '-c', CERTFILE],
+                        'ftpsi://localhost:%d' % (port + 2)))
+
+    procs = []
+    urls = []
+
+    for args, url in servers:
+        procs.append(subprocess.Popen([sys.executable, script] + args + [root],
+                                      stderr=subprocess.DEVNULL))
+        port = int(url.rsplit(':', 1)[1])
+
+        for _ in range(50):
+            try:
+                socket.create_connection(('localhost', port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        urls.append(url)
+
+    return root, procs, urls
+
+
+def main(args):
+    output = previous = None
+    size = SIZE
+    listing_sizes = LISTING_SIZES
+    start = False
+    port = 2121
+    urls = []
+
+    while args:
+        arg = args.pop(0)
+
+        if arg == '-o':
+            output = args.pop(0)
+        elif arg == '-c':
+            previous = args.pop(0)
+        elif arg == '-s':
+            size = int(args.pop(0))
+        elif arg == '-l':
+            listing_sizes = [int(n) for n in args.pop(0).split(',')]
+        elif arg == '-p':
+            port = int(args.pop(0))
+        elif arg == '--setup':
+            return setup(args.pop(0), listing_sizes)
+        elif arg == '--start-server':
+            start = True
+        elif arg in ('-h', '--help'):
+            print(__doc__)
+            return
+        else:
+            urls.append(arg)
+
+    root = None
+    procs = []
+
+    if start:
+        root, procs, urls = start_servers(port, listing_sizes)
+    elif not urls:
+        print("Usage: bench_suite.py [options] <ftp[s[i]]://host:port>...")
+        return 2
+
+    bench = Bench(size, listing_sizes)
+
+    try:
+        for url in urls:
+            bench.run(url)
+    finally:
+        for proc in procs:
+            proc.terminate()
+
+        if root:
+            import shutil
+            shutil.rmtree(root)
+
+    if output:
+        with open(output, 'w') as fp:
+            json.dump({
+                'implementation': sys.implementation.name,
+                'version': '.'.join(str(v) for v in sys.implementation.version[:3]),
+                'platform': sys.platform,
+                'results': bench.results,
+            }, fp)
+
+    if previous:
+        compare(bench.results, previous)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) or 0)
@@ -14,7 +14,15 @@ import os
 
 from pyftpdlib.servers import FTPServer
 from pyftpdlib.authorizers import DummyAuthorizer
-from pyftpdlib.handlers import FTPHandler, TLS_FTPHandler
+from pyftpdlib.handlers import FTPHandler, ThrottledDTPHandler, TLS_FTPHandler
+
+
+class ImplicitTLS_FTPHandler(TLS_FTPHandler):
+    """Secure the control connection before sending the welcome message."""
+
+    def handle(self):
+        self.secure_connection(self.ssl_context)
+        super().handle()
 
 
 def main(args=None):
@@ -50,12 +58,34 @@ def main(args=None):
         action="store_true",
         help="Enable and require TLS"
     )
+    ap.add_argument(
+        "-C",
+        "--clear-data",
+        action="store_true",
+        help="With TLS, allow clear-text data connections (PROT C)"
+    )
+    ap.add_argument(
+        "-i",
+        "--implicit",
+        action="store_true",
+        help="With TLS, secure the control connection right after connecting "
+             "(implicit FTPS)"
+    )
     ap.add_argument(
         "-w",
         "--writable",
         action="store_true",
         help="Allow authenticated users to write to FTP root directory",
     )
+    ap.add_argument(
+        "-l",
+        "--rate-limit",
+        type=int,
+        default=0,
+        metavar="BYTES",
+        help="Limit transfer rate of each data connection to BYTES/s "
+             "(default: no limit)",
+    )
     ap.add_argument(
         "-v",
         "--verbose",
@@ -84,10 +114,21 @@ def main(args=None):
         handler.certfile = args.certfile
         # requires SSL for both control and data channel
         handler.tls_control_required = True
-        handler.tls_data_required = True
+        handler.tls_data_required = not args.clear_data
+
+        if args.implicit:
+            handler = ImplicitTLS_FTPHandler
     else:
         handler = FTPHandler
 
+    if args.rate_limit:
+        # A per-connection rate limit approximates a TCP stream whose throughput
+        # is bound by the round-trip time of the link
+        dtp_handler = type("Throttled" + handler.dtp_handler.__name__,
+                           (ThrottledDTPHandler, handler.dtp_handler), {})
+        dtp_handler.read_limit = dtp_handler.write_limit = args.rate_limit
+        handler.dtp_handler = dtp_handler
+
     handler.authorizer = authorizer
     server = FTPServer(("", args.port), handler)
     server.serve_forever()
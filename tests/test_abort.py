@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Check that transfers, which are stopped early, leave the session usable.
+
+Stops an MLSD listing and a RETR in line mode early, by closing the
+generator and by raising an exception in the callback, and checks that the
+next command gets its own reply. Needs a writable test server, plain or with
+TLS, e.g.::
+
+    python3 tests/pyftpdlib-server.py -w -p 2121 tests/ftproot &
+    python3 tests/test_abort.py ftp://localhost:2121
+
+    python3 tests/pyftpdlib-server.py -s -w -p 2123 -c tests/keycert.pem tests/ftproot &
+    python3 tests/test_abort.py ftps://localhost:2123 tests/keycert.pem
+
+"""
+
+import sys
+
+try:
+    import io
+except ImportError:
+    import uio as io
+
+from ftplib import FTP
+from ftpbatch import mkd_many, pipeline
+
+DIRNAME = 'abort_test'
+TEXTFILE = 'abort_test.txt'
+
+
+def connect(url, cafile):
+    use_ssl = url.startswith('ftps://')
+    host = url.split('://', 1)[-1]
+
+    try:
+        host, port = host.rsplit(':', 1)
+        port = int(port)
+    except ValueError:
+        port = 21
+
+    if use_ssl:
+        from ftplibtls import FTP_TLS, ssl
+
+        if hasattr(ssl, "create_default_context"):
+            ctx = ssl.create_default_context(cafile=cafile)
+        else:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            ctx.verify_mode = ssl.CERT_REQUIRED
+            ctx.load_verify_locations(cafile=cafile)
+
+        ftp = FTP_TLS(ssl_context=ctx, server_hostname="example.com")
+    else:
+        ftp = FTP()
+
+    ftp.connect(host, port)
+    ftp.login('joedoe', 'abc123')
+
+    if use_ssl:
+        ftp.prot_p()
+
+    return ftp
+
+
+def check_noop(ftp):
+    resp = ftp.sendcmd('NOOP')
+    assert resp[:3] == '200', "out of sync: %r" % resp
+
+
+def test_close_listing(ftp):
+    entries = ftp.mlsd(DIRNAME)
+    next(entries)
+    entries.close()
+    check_noop(ftp)
+
+
+def test_callback_error(ftp):
+    def callback(line):
+        raise KeyError(line)
+
+    try:
+        ftp.retrlines('RETR ' + TEXTFILE, callback)
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("KeyError expected")
+
+    check_noop(ftp)
+
+
+def main(args):
+    url = args[0] if args else 'ftp://localhost:2121'
+    cafile = args[1] if len(args) > 1 else 'tests/keycert.pem'
+    names = ['%s/d%i' % (DIRNAME, i) for i in range(500)]
+    lines = b''.join(b'line %i\r\n' % i for i in range(200000))
+
+    with connect(url, cafile) as ftp:
+        ftp.mkd(DIRNAME)
+        mkd_many(ftp, names)
+        ftp.storbinary('STOR ' + TEXTFILE, io.BytesIO(lines))
+
+        try:
+            for test in (test_close_listing, test_callback_error):
+                test(ftp)
+                print(test.__name__, "OK")
+        finally:
+            ftp.delete(TEXTFILE)
+            pipeline(ftp, ['RMD ' + name for name in names])
+            ftp.rmd(DIRNAME)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) or 0)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Check the commands sent by ftpcp for server-to-server copies.
+
+Doesn't need a server: the control connections are stubs, which reply to
+each command with scripted replies and record the commands sent. This also
+covers copies between FTP_TLS sessions with protected data connections
+(SSCN and CPSV), which the pyftpdlib test server doesn't support, and copies
+with sessions from a pool.
+
+Runs with CPython and the MicroPython unix port::
+
+    python3 tests/test_ftpcp.py
+    MICROPYPATH=`pwd` micropython tests/test_ftpcp.py
+
+"""
+
+import sys
+
+import ftplib
+from ftpcp import ftpcp, ftpcp_many
+from ftplibtls import FTP_TLS
+from ftppool import FTPPool
+
+
+class StubConnection:
+    """A control connection with scripted replies.
+
+    replies maps a command, or its first word, to the lines the server sends
+    in reply, which may include the final reply of a transfer.
+    """
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.sent = []
+        # Commands sent as out-of-band data
+        self.urgent = []
+        self.lines = []
+
+    def sendall(self, data, flags=0):
+        cmd = data.decode().rstrip('\r\n')
+        self.sent.append(cmd)
+
+        if flags:
+            self.urgent.append(cmd)
+        reply = self.replies.get(cmd, self.replies.get(cmd.split()[0]))
+
+        if reply is None:
+            reply = ['500 Command not understood.']
+
+        self.lines.extend(reply)
+
+    def readline(self, size):
+        if not self.lines:
+            return b''
+
+        return self.lines.pop(0).encode() + b'\r\n'
+
+    def close(self):
+        pass
+
+
+def stub(cls, replies, prot_p=False):
+    ftp = cls()
+    ftp.sock = ftp.file = StubConnection(dict(replies))
+
+    if prot_p:
+        # As after FTP_TLS.prot_p()
+        ftp._prot_p = True
+
+    return ftp
+
+
+SOURCE = {
+    'TYPE': ['200 Type set to: Binary.'],
+    'PASV': ['227 Entering passive mode (127,0,0,1,156,65).'],
+    'RETR a.bin': ['150 File status okay.', '226 Transfer complete.'],
+    'RETR missing.bin': ['550 No such file or directory.'],
+    'RETR broken.bin': ['150 File status okay.', '426 Connection closed; transfer aborted.'],
+    'CPSV': ['227 Entering passive mode (127,0,0,1,156,66).'],
+}
+
+TARGET = {
+    'TYPE': ['200 Type set to: Binary.'],
+    'PORT': ['200 Active data connection established.'],
+    'STOR': ['150 File status okay.', '226 Transfer complete.'],
+}
+
+
+class StubPool(FTPPool):
+    """A pool of stub sessions, with the replies of SOURCE on port 1021."""
+
+    def _create(self, host, port, user, passwd, acct):
+        ftp = stub(ftplib.FTP, dict(SOURCE if port == 1021 else TARGET,
+                                    NOOP=['200 I successfully done nothin\'.']))
+        ftp._pool_key = (host, port or ftplib.FTP_PORT, user)
+        ftp._pool_home = ''
+        return ftp
+
+
+def test_copy():
+    source = stub(ftplib.FTP, SOURCE)
+    target = stub(ftplib.FTP, TARGET)
+    ftpcp(source, 'a.bin', target, 'b.bin')
+    assert source.sock.sent == ['TYPE I', 'PASV', 'RETR a.bin'], source.sock.sent
+    assert target.sock.sent == ['TYPE I', 'PORT 127,0,0,1,156,65', 'STOR b.bin'], target.sock.sent
+    assert not source.sock.lines and not target.sock.lines
+
+
+def test_missing_source():
+    source = stub(ftplib.FTP, SOURCE)
+    # The STOR is aborted: the reply to it, then the reply to ABOR
+    target = stub(ftplib.FTP, dict(TARGET, ABOR=['426 Transfer aborted.', '226 ABOR successful.']))
+    target.sock.replies['STOR missing.bin'] = ['150 File status okay.']
+    errors = ftpcp_many(source, target, [('missing.bin', ''), ('a.bin', '')])
+    assert [item for item, exc in errors] == [('missing.bin', '')], errors
+    assert target.sock.sent == ['TYPE I', 'PORT 127,0,0,1,156,65', 'STOR missing.bin', 'ABOR',
+                                'PORT 127,0,0,1,156,65', 'STOR a.bin'], target.sock.sent
+    assert not target.sock.lines, target.sock.lines
+
+
+def test_missing_source_no_data():
+    source = stub(ftplib.FTP, SOURCE)
+    # Only a reply to ABOR, as no data was transferred (e.g. pyftpdlib)
+    target = stub(ftplib.FTP, dict(TARGET, ABOR=['225 ABOR command successful.']))
+    target.sock.replies['STOR missing.bin'] = ['125 Data connection already open.']
+    errors = ftpcp_many(source, target, [('missing.bin', ''), ('a.bin', '')])
+    assert [item for item, exc in errors] == [('missing.bin', '')], errors
+    assert not target.sock.lines, target.sock.lines
+
+
+def test_missing_source_completed():
+    source = stub(ftplib.FTP, SOURCE)
+    # The target completed the STOR (e.g. an empty file) before the ABOR
+    target = stub(ftplib.FTP, dict(TARGET, ABOR=['226 Transfer complete.',
+                                                 '225 No transfer to abort.']))
+    target.sock.replies['STOR missing.bin'] = ['150 File status okay.']
+    errors = ftpcp_many(source, target, [('missing.bin', ''), ('a.bin', '')])
+    assert [item for item, exc in errors] == [('missing.bin', '')], errors
+    assert not target.sock.lines, target.sock.lines
+
+
+def test_failed_source_transfer():
+    source = stub(ftplib.FTP, SOURCE)
+    target = stub(ftplib.FTP, TARGET)
+    target.sock.replies['STOR broken.bin'] = ['150 File status okay.',
+                                              '426 Connection closed; transfer aborted.']
+    errors = ftpcp_many(source, target, [('broken.bin', ''), ('a.bin', '')])
+    # The error doesn't affect the next file
+    assert [item for item, exc in errors] == [('broken.bin', '')], errors
+    assert not source.sock.lines and not target.sock.lines
+
+
+def test_pool_same_host():
+    # Two streams would need four sessions to the host: one is used
+    pool = StubPool(max_per_host=2)
+    files = [('a.bin', 'b%i.bin' % i) for i in range(4)]
+    errors = ftpcp_many(dict(host='localhost', port=1021), dict(host='localhost', port=1022),
+                        files, pool=pool, streams=2, wait=1)
+    assert not errors, errors
+    assert pool.stats['misses'] == 2, pool.stats
+
+
+def test_pool_streams():
+    pool = StubPool(max_per_host=2)
+    files = [('a.bin', 'b%i.bin' % i) for i in range(20)]
+    errors = ftpcp_many(dict(host='source', port=1021), dict(host='target', port=1022),
+                        files, pool=pool, streams=2, wait=1)
+    assert not errors, errors
+
+
+def test_pool_exhausted():
+    # The target session can never be checked out
+    pool = StubPool(max_per_host=1)
+
+    try:
+        ftpcp_many(dict(host='localhost', port=1021), dict(host='localhost', port=1022),
+                   [('a.bin', '')], pool=pool, wait=0.1)
+    except ftplib.Error:
+        pass
+    else:
+        raise AssertionError("ftplib.Error expected")
+
+
+def test_tls_sscn():
+    source = stub(FTP_TLS, SOURCE, prot_p=True)
+    target = stub(FTP_TLS, dict(TARGET, SSCN=['200 SSCN:CLIENT METHOD']), prot_p=True)
+    errors = ftpcp_many(source, target, [('a.bin', 'b.bin'), ('a.bin', 'c.bin')])
+    assert not errors, errors
+    # SSCN is only sent once, the target keeps acting as TLS client
+    assert source.sock.sent == ['TYPE I', 'PASV', 'RETR a.bin', 'PASV', 'RETR a.bin'], \
+        source.sock.sent
+    assert target.sock.sent == ['TYPE I', 'SSCN ON', 'PORT 127,0,0,1,156,65', 'STOR b.bin',
+                                'PORT 127,0,0,1,156,65', 'STOR c.bin'], target.sock.sent
+    assert target._sscn is True
+
+
+def test_tls_cpsv():
+    source = stub(FTP_TLS, SOURCE, prot_p=True)
+    # SSCN not supported by the target: the source acts as TLS client
+    target = stub(FTP_TLS, TARGET, prot_p=True)
+    errors = ftpcp_many(source, target, [('a.bin', 'b.bin'), ('a.bin', 'c.bin')])
+    assert not errors, errors
+    assert source.sock.sent == ['TYPE I', 'CPSV', 'RETR a.bin', 'CPSV', 'RETR a.bin'], \
+        source.sock.sent
+    # SSCN is only tried once
+    assert target.sock.sent == ['TYPE I', 'SSCN ON', 'PORT 127,0,0,1,156,66', 'STOR b.bin',
+                                'PORT 127,0,0,1,156,66', 'STOR c.bin'], target.sock.sent
+    assert target._sscn is None
+
+
+def test_tls_missing_source():
+    source = stub(FTP_TLS, SOURCE, prot_p=True)
+    target = stub(FTP_TLS, dict(TARGET, SSCN=['200 SSCN:CLIENT METHOD'],
+                                ABOR=['426 Transfer aborted.', '226 ABOR successful.']),
+                  prot_p=True)
+    target.sock.replies['STOR missing.bin'] = ['150 File status okay.']
+    errors = ftpcp_many(source, target, [('missing.bin', ''), ('a.bin', '')])
+    assert [item for item, exc in errors] == [('missing.bin', '')], errors
+    # TLS sockets don't support out-of-band data
+    assert 'ABOR' in target.sock.sent and not target.sock.urgent, target.sock.urgent
+    assert target.sock.sent[-1] == 'STOR a.bin', target.sock.sent
+    assert not target.sock.lines, target.sock.lines
+
+
+def test_protection_differs():
+    source = stub(FTP_TLS, SOURCE, prot_p=True)
+    target = stub(FTP_TLS, TARGET)
+
+    try:
+        ftpcp(source, 'a.bin', target)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("ValueError expected")
+
+
+def main(args):
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(name, "OK")
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) or 0)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Upload files over protected data connections and check what was stored.
+
+Uploads files of several sizes with storbinary(), storbinary_from() and
+storlines() over PROT P, each on a fresh session, and checks their size on
+the server (in binary mode) and, downloaded again, their content. Also lists
+an empty directory, which sends no data over the data connection. Needs a
+writable TLS test server, e.g.::
+
+    python3 tests/pyftpdlib-server.py -s -w -p 2121 -c tests/keycert.pem tests/ftproot &
+    python3 tests/test_tls_upload.py localhost 2121 tests/keycert.pem
+
+"""
+
+import sys
+
+try:
+    import io
+except ImportError:
+    import uio as io
+
+from ftplibtls import FTP_TLS, ssl
+
+ROUNDS = 5
+SIZES = (0, 1, 8191, 8192, 20000, 100000)
+
+
+def connect(host, port, cafile, reuse_session):
+    if hasattr(ssl, "create_default_context"):
+        ctx = ssl.create_default_context(cafile=cafile)
+    else:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        ctx.verify_mode = ssl.CERT_REQUIRED
+        ctx.load_verify_locations(cafile=cafile)
+
+    ftp = FTP_TLS(ssl_context=ctx, server_hostname="example.com")
+    ftp.reuse_session = reuse_session
+    ftp.connect(host, port)
+    ftp.login('joedoe', 'abc123')
+    ftp.prot_p()
+    return ftp
+
+
+def check(ftp, name, data):
+    ftp.voidcmd('TYPE I')
+    size = ftp.size(name)
+    assert size == len(data), "%s: stored %s of %i bytes" % (name, size, len(data))
+    received = []
+    ftp.retrbinary('RETR ' + name, received.append)
+    assert b''.join(received) == data, "%s: content differs" % name
+    ftp.delete(name)
+
+
+def check_empty_listing(ftp):
+    ftp.mkd('tls_empty')
+
+    try:
+        assert ftp.nlst('tls_empty') == []
+        lines = []
+        ftp.retrlines('LIST tls_empty', lines.append)
+        assert lines == [], lines
+        assert [name for name, facts in ftp.mlsd('tls_empty')
+                if name not in ('.', '..')] == []
+    finally:
+        ftp.rmd('tls_empty')
+
+
+def main(args):
+    host = args[0] if args else 'localhost'
+    port = int(args[1]) if len(args) > 1 else 2121
+    cafile = args[2] if len(args) > 2 else 'tests/keycert.pem'
+
+    # Resuming the TLS session on data connections is the default
+    for reuse_session in (True, False):
+        for _ in range(ROUNDS):
+            for size in SIZES:
+                # A pattern, which reveals lost or reordered blocks
+                data = bytes(i % 251 for i in range(size))
+
+                with connect(host, port, cafile, reuse_session) as ftp:
+                    ftp.storbinary('STOR tls_upload.bin', io.BytesIO(data))
+                    check(ftp, 'tls_upload.bin', data)
+
+                with connect(host, port, cafile, reuse_session) as ftp:
+                    ftp.storbinary_from('STOR tls_upload.bin', io.BytesIO(data),
+                                        bytearray(4096))
+                    check(ftp, 'tls_upload.bin', data)
+
+            lines = ['line %i' % i for i in range(5000)]
+
+            with connect(host, port, cafile, reuse_session) as ftp:
+                ftp.storlines('STOR tls_upload.txt', io.BytesIO('\r\n'.join(lines).encode()))
+                # The server may store the lines with other line endings
+                received = []
+                ftp.retrlines('RETR tls_upload.txt', received.append)
+                assert received == lines, "tls_upload.txt: got %i of %i lines" % (
+                    len(received), len(lines))
+                ftp.delete('tls_upload.txt')
+
+            with connect(host, port, cafile, reuse_session) as ftp:
+                check_empty_listing(ftp)
+
+    print("OK")
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) or 0)